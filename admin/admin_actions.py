@@ -1,8 +1,10 @@
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.exceptions import TelegramBadRequest
 from database import Database
 from .texts import AdminTexts, AdminButtons
+from .broadcast import broadcast_worker
 from .keyboards import (
     admin_main_kb,
     moder_kb,
@@ -10,8 +12,10 @@ from .keyboards import (
     request_actions_kb,
     users_list_kb,
     user_actions_kb,
-    cancel_kb,
-    confirm_broadcast_kb
+    confirm_broadcast_kb,
+    broadcast_start_kb,
+    broadcast_jobs_kb,
+    broadcast_job_kb
 )
 
 db = Database()
@@ -38,7 +42,7 @@ class AdminActions:
                 reply_markup=kb
             )
 
-    async def show_stats(self, callback: CallbackQuery):
+    async def show_stats(self, callback: CallbackQuery, is_admin: bool = False):
         """Показать статистику"""
         stats = await db.get_stats()
         await callback.message.edit_text(
@@ -47,22 +51,26 @@ class AdminActions:
                 active_users=stats['active_staff'],
                 requests_count=stats['pending_requests']
             ),
-            reply_markup=admin_main_kb() if await self._check_admin(callback.from_user.id) else moder_kb()
+            reply_markup=admin_main_kb() if is_admin else moder_kb()
         )
 
-    async def show_requests(self, callback: CallbackQuery):
-        """Показать список заявок"""
-        requests = await db.get_requests()
-        if not requests:
-            await callback.message.edit_text(
-                text="Нет активных заявок",
-                reply_markup=admin_main_kb()
-            )
-            return
-            
+    async def show_requests(
+        self,
+        callback: CallbackQuery,
+        status: str = None,
+        before_id: int = None,
+        after_id: int = None
+    ):
+        """Показать страницу заявок (status=None - все статусы)"""
+        page = await db.get_requests_page(status, before_id=before_id, after_id=after_id)
+        counts = await db.get_request_counts()
+        
         await callback.message.edit_text(
-            text=AdminTexts.REQUESTS_LIST,
-            reply_markup=requests_list_kb(requests)
+            text=AdminTexts.REQUESTS_LIST_TOTAL.format(
+                filter=AdminButtons.REQUEST_FILTERS[status or "all"],
+                total=page['total']
+            ) if page['requests'] else AdminTexts.NO_REQUESTS,
+            reply_markup=requests_list_kb(page, counts)
         )
 
     async def show_request_detail(self, callback: CallbackQuery, request_id: int):
@@ -111,17 +119,11 @@ class AdminActions:
             ])
         )
 
-    async def show_users(self, callback: CallbackQuery):
-        """Показать список пользователей"""
-        users_data = await db.get_all_users()
-        users = [{
-            'id': tg_id,
-            'username': username,
-            'status': (await db.get_user(tg_id))['status'],
-            'is_banned': (await db.get_user(tg_id))['is_banned']
-        } for username, tg_id in users_data if await db.get_user(tg_id)]
+    async def show_users(self, callback: CallbackQuery, after: str = None, before: str = None):
+        """Показать страницу списка пользователей"""
+        page = await db.get_users_page(after=after, before=before)
         
-        if not users:
+        if not page['users']:
             await callback.message.edit_text(
                 text="Нет пользователей",
                 reply_markup=admin_main_kb()
@@ -129,8 +131,8 @@ class AdminActions:
             return
             
         await callback.message.edit_text(
-            text=AdminTexts.USERS_LIST,
-            reply_markup=users_list_kb(users)
+            text=AdminTexts.USERS_LIST_TOTAL.format(total=page['total']),
+            reply_markup=users_list_kb(page)
         )
 
     async def show_user_detail(self, callback: CallbackQuery, user_id: int):
@@ -175,18 +177,23 @@ class AdminActions:
         """Начать рассылку"""
         await callback.message.edit_text(
             text=AdminTexts.BROADCAST_START,
-            reply_markup=cancel_kb()
+            reply_markup=broadcast_start_kb()
         )
         await state.set_state(BroadcastStates.waiting_for_message)
 
     async def process_broadcast_message(self, message: Message, state: FSMContext):
-        """Обработать текст рассылки"""
+        """Запомнить сообщение для рассылки: получателям уйдёт его копия"""
         users_count = await db.get_active_users_count()
-        await state.update_data(message_text=message.text)
+        preview = message.text or message.caption or AdminTexts.BROADCAST_MEDIA.format(type=message.content_type)
+        await state.update_data(
+            message_text=preview,
+            source_chat_id=message.chat.id,
+            source_message_id=message.message_id
+        )
         
-        await message.answer(
+        await message.reply(
             text=AdminTexts.BROADCAST_CONFIRM.format(
-                text=message.text,
+                text=preview,
                 count=users_count
             ),
             reply_markup=confirm_broadcast_kb()
@@ -194,30 +201,69 @@ class AdminActions:
         await state.set_state(BroadcastStates.confirmation)
 
     async def confirm_broadcast(self, callback: CallbackQuery, state: FSMContext):
-        """Подтвердить рассылку"""
+        """Подтвердить рассылку: создать задание для фонового исполнителя"""
         data = await state.get_data()
-        users = await db.get_active_users()
-        success = 0
-        
-        await callback.message.edit_text("⏳ Рассылка начата...")
+        job_id = await db.create_broadcast_job(
+            created_by=callback.from_user.id,
+            text=data['message_text'],
+            status_chat_id=callback.message.chat.id,
+            status_message_id=callback.message.message_id,
+            source_chat_id=data.get('source_chat_id'),
+            source_message_id=data.get('source_message_id')
+        )
+        broadcast_worker.notify()
+        await state.clear()
         
-        for user in users:
-            try:
-                await callback.bot.send_message(
-                    chat_id=user['telegram_id'],
-                    text=data['message_text']
-                )
-                success += 1
-            except Exception:
-                continue
-                
         await callback.message.edit_text(
-            text=AdminTexts.BROADCAST_SUCCESS.format(
-                success=success,
-                total=len(users)
-            )
+            text=AdminTexts.BROADCAST_QUEUED.format(id=job_id),
+            reply_markup=broadcast_job_kb({'id': job_id, 'status': 'pending'})
         )
-        await state.clear()
+
+    async def show_broadcast_jobs(self, callback: CallbackQuery):
+        """Последние задания рассылки"""
+        jobs = await db.get_broadcast_jobs()
+        await callback.message.edit_text(
+            text=AdminTexts.BROADCAST_JOBS if jobs else AdminTexts.BROADCAST_NO_JOBS,
+            reply_markup=broadcast_jobs_kb(jobs)
+        )
+
+    async def show_broadcast_job(self, callback: CallbackQuery, job_id: int):
+        """Прогресс и управление заданием рассылки"""
+        job = await db.get_broadcast_job(job_id)
+        if not job:
+            await callback.answer(AdminTexts.BROADCAST_JOB_NOT_FOUND, show_alert=True)
+            return
+        
+        counts = broadcast_worker.progress(job_id) or job
+        text = AdminTexts.BROADCAST_JOB.format(
+            id=job_id,
+            status=AdminTexts.BROADCAST_STATUSES.get(job['status'], job['status']),
+            done=sum(counts[kind] for kind in ('sent', 'blocked', 'deactivated', 'failed')),
+            total=job['total'],
+            sent=counts['sent'],
+            blocked=counts['blocked'],
+            deactivated=counts['deactivated'],
+            failed=counts['failed'],
+            text=job['text'][:1000]
+        )
+        try:
+            await callback.message.edit_text(text=text, reply_markup=broadcast_job_kb(job))
+        except TelegramBadRequest as e:
+            # Прогресс не изменился с прошлого обновления
+            if "message is not modified" not in str(e):
+                raise
+            await callback.answer()
+
+    async def broadcast_job_action(self, callback: CallbackQuery, action: str, job_id: int):
+        """Пауза, продолжение или отмена задания рассылки"""
+        handlers = {
+            'pause': broadcast_worker.pause,
+            'resume': broadcast_worker.resume,
+            'cancel': broadcast_worker.cancel,
+        }
+        if not await handlers[action](job_id):
+            await callback.answer(AdminTexts.BROADCAST_JOB_STATUS_CHANGED, show_alert=True)
+        await self.show_broadcast_job(callback, job_id)
 
     async def cancel_broadcast(self, callback: CallbackQuery, state: FSMContext):
         """Отменить рассылку"""
@@ -8,9 +8,7 @@ from admin.admin_actions import AdminActions, BroadcastStates
 from admin.keyboards import (
     admin_main_kb,
     moder_kb,
-    requests_list_kb,
     request_actions_kb,
-    users_list_kb,
     user_actions_kb,
     cancel_kb,
     confirm_broadcast_kb
@@ -21,22 +19,22 @@ admin_router = Router()
 db = Database()
 actions = AdminActions()
 
-def check_access(callback: CallbackQuery) -> bool:
-    """Проверка прав доступа для callback"""
-    return db.is_admin(callback.from_user.id) or db.is_moderator(callback.from_user.id)
+def check_access(is_admin: bool, is_moderator: bool) -> bool:
+    """Проверка прав доступа (роли проставляет RoleMiddleware)"""
+    return is_admin or is_moderator
 
 # ================== Основные команды ==================
 @admin_router.message(Command("admin"))
-async def admin_start(message: Message):
-    if await db.is_admin(message.from_user.id):
+async def admin_start(message: Message, is_admin: bool):
+    if is_admin:
         await message.answer(
             text=AdminTexts.WELCOME,
             reply_markup=admin_main_kb()
         )
 
 @admin_router.message(Command("moder"))
-async def moder_start(message: Message):
-    if await db.is_moderator(message.from_user.id):
+async def moder_start(message: Message, is_moderator: bool):
+    if is_moderator:
         await message.answer(
             text=AdminTexts.MODER_WELCOME,
             reply_markup=moder_kb()
@@ -44,49 +42,44 @@ async def moder_start(message: Message):
 
 # ================== Навигация ==================
 @admin_router.callback_query(F.data == "nav:main")
-async def main_menu(callback: CallbackQuery):
-    if not await check_access(callback):
+async def main_menu(callback: CallbackQuery, is_admin: bool, is_moderator: bool):
+    if not check_access(is_admin, is_moderator):
         return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
     
-    is_admin = await db.is_admin(callback.from_user.id)
     await actions.show_main_menu(callback, is_admin)
 
 @admin_router.callback_query(F.data == "nav:cancel")
-async def cancel_action(callback: CallbackQuery, state: FSMContext):
+async def cancel_action(callback: CallbackQuery, state: FSMContext, is_admin: bool, is_moderator: bool):
     await state.clear()
-    await main_menu(callback)
+    await main_menu(callback, is_admin, is_moderator)
 
 # ================== Заявки ==================
 @admin_router.callback_query(F.data.startswith("nav:requests"))
-async def handle_requests(callback: CallbackQuery):
-    if not await check_access(callback):
+async def handle_requests(callback: CallbackQuery, is_admin: bool, is_moderator: bool):
+    if not check_access(is_admin, is_moderator):
         return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
     
-    # Обработка пагинации
-    if ":page:" in callback.data:
-        offset = int(callback.data.split(":")[-1])
-        requests = await db.get_requests()
-        await callback.message.edit_text(
-            text=AdminTexts.REQUESTS_LIST,
-            reply_markup=requests_list_kb(requests, offset)
-        )
-        return
-    
     # Детали заявки
     if ":detail:" in callback.data:
         request_id = int(callback.data.split(":")[-1])
         await actions.show_request_detail(callback, request_id)
         return
     
-    # Основной список заявок
-    requests = await db.get_requests()
-    await callback.message.edit_text(
-        text=AdminTexts.REQUESTS_LIST,
-        reply_markup=requests_list_kb(requests)
-    )
+    # Список заявок: nav:requests[:st:<status>|:next|prev:<status>:<id>]
+    parts = callback.data.split(":")
+    status = parts[3] if len(parts) > 3 and parts[3] != "all" else None
+    if len(parts) == 5 and parts[2] == "next":
+        await actions.show_requests(callback, status, before_id=int(parts[4]))
+    elif len(parts) == 5 and parts[2] == "prev":
+        await actions.show_requests(callback, status, after_id=int(parts[4]))
+    else:
+        await actions.show_requests(callback, status)
 
 @admin_router.callback_query(F.data.startswith("action:requests:"))
-async def handle_request_actions(callback: CallbackQuery):
+async def handle_request_actions(callback: CallbackQuery, is_admin: bool, is_moderator: bool):
+    if not check_access(is_admin, is_moderator):
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
     action = callback.data.split(":")[2]
     request_id = int(callback.data.split(":")[-1])
     
@@ -97,49 +90,30 @@ async def handle_request_actions(callback: CallbackQuery):
 
 # ================== Пользователи ==================
 @admin_router.callback_query(F.data.startswith("nav:users"))
-async def handle_users(callback: CallbackQuery):
-    if not await db.is_admin(callback.from_user.id):
+async def handle_users(callback: CallbackQuery, is_admin: bool):
+    if not is_admin:
         return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
     
-    # Обработка пагинации
-    if ":page:" in callback.data:
-        offset = int(callback.data.split(":")[-1])
-        users_data = await db.get_all_users()
-        users = [{
-            'id': tg_id,
-            'username': username,
-            'status': (await db.get_user(tg_id))['status'],
-            'is_banned': (await db.get_user(tg_id))['is_banned']
-        } for username, tg_id in users_data if await db.get_user(tg_id)]
-        
-        await callback.message.edit_text(
-            text=AdminTexts.USERS_LIST,
-            reply_markup=users_list_kb(users, offset)
-        )
-        return
-    
     # Детали пользователя
     if ":detail:" in callback.data:
         user_id = int(callback.data.split(":")[-1])
         await actions.show_user_detail(callback, user_id)
         return
     
-    # Основной список пользователей
-    users_data = await db.get_all_users()
-    users = [{
-        'id': tg_id,
-        'username': username,
-        'status': (await db.get_user(tg_id))['status'],
-        'is_banned': (await db.get_user(tg_id))['is_banned']
-    } for username, tg_id in users_data if await db.get_user(tg_id)]
-    
-    await callback.message.edit_text(
-        text=AdminTexts.USERS_LIST,
-        reply_markup=users_list_kb(users)
-    )
+    # Список пользователей: nav:users[:next|prev:<username>]
+    parts = callback.data.split(":", 3)
+    if len(parts) == 4 and parts[2] == "next":
+        await actions.show_users(callback, after=parts[3])
+    elif len(parts) == 4 and parts[2] == "prev":
+        await actions.show_users(callback, before=parts[3])
+    else:
+        await actions.show_users(callback)
 
 @admin_router.callback_query(F.data.startswith("action:users:"))
-async def handle_user_actions(callback: CallbackQuery):
+async def handle_user_actions(callback: CallbackQuery, is_admin: bool):
+    if not is_admin:
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
     action = callback.data.split(":")[2]
     user_id = int(callback.data.split(":")[-1])
     
@@ -150,20 +124,23 @@ async def handle_user_actions(callback: CallbackQuery):
 
 # ================== Статистика ==================
 @admin_router.callback_query(F.data == "nav:stats")
-async def show_stats(callback: CallbackQuery):
-    await actions.show_stats(callback)
+async def show_stats(callback: CallbackQuery, is_admin: bool, is_moderator: bool):
+    if not check_access(is_admin, is_moderator):
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
+    await actions.show_stats(callback, is_admin)
 
 # ================== Рассылка ==================
 @admin_router.callback_query(F.data == "nav:broadcast")
-async def start_broadcast(callback: CallbackQuery, state: FSMContext):
-    if not await db.is_admin(callback.from_user.id):
+async def start_broadcast(callback: CallbackQuery, state: FSMContext, is_admin: bool):
+    if not is_admin:
         return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
     
     await actions.start_broadcast(callback, state)
 
 @admin_router.message(BroadcastStates.waiting_for_message)
-async def process_broadcast_message(message: Message, state: FSMContext):
-    if not await db.is_admin(message.from_user.id):
+async def process_broadcast_message(message: Message, state: FSMContext, is_admin: bool):
+    if not is_admin:
         return
     
     await actions.process_broadcast_message(message, state)
@@ -172,5 +149,29 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     F.data == "action:broadcast:confirm",
     StateFilter(BroadcastStates.confirmation)
 )
-async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, is_admin: bool):
+    if not is_admin:
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
     await actions.confirm_broadcast(callback, state)
+
+@admin_router.callback_query(F.data.startswith("nav:broadcast:"))
+async def broadcast_jobs(callback: CallbackQuery, state: FSMContext, is_admin: bool):
+    if not is_admin:
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
+    await state.clear()
+    if callback.data.startswith("nav:broadcast:job:"):
+        await actions.show_broadcast_job(callback, int(callback.data.split(":")[-1]))
+    else:
+        await actions.show_broadcast_jobs(callback)
+
+@admin_router.callback_query(F.data.startswith("action:broadcast:job:"))
+async def broadcast_job_action(callback: CallbackQuery, is_admin: bool):
+    if not is_admin:
+        return await callback.answer(AdminTexts.ACCESS_DENIED, show_alert=True)
+    
+    _, _, _, action, job_id = callback.data.split(":")
+    if action not in ("pause", "resume", "cancel"):
+        return await callback.answer()
+    await actions.broadcast_job_action(callback, action, int(job_id))
@@ -0,0 +1,420 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from admin.keyboards import broadcast_job_kb
+from admin.texts import AdminTexts
+from config import Config
+from database import Database
+from utils import ProgressReporter, TokenBucket, call_with_retries, run_workers
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[Bot, int], Awaitable[Any]]
+ProgressCallback = Callable[["BroadcastResult"], Awaitable[None]]
+ResultCallback = Callable[[int, str, Optional[str]], Awaitable[None]]
+
+SENT = "sent"
+BLOCKED = "blocked"
+DEACTIVATED = "deactivated"
+TRANSIENT = "transient"
+FAILED = "failed"
+
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки по получателям"""
+    total: int = 0
+    sent: int = 0
+    blocked: int = 0
+    deactivated: int = 0
+    failed: int = 0
+    retries: int = 0
+    errors: Dict[int, str] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+    finished: bool = False
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.deactivated + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+def text_message(text: str, **kwargs: Any) -> Sender:
+    """Отправка одинакового текста каждому получателю"""
+    async def send(bot: Bot, chat_id: int) -> Any:
+        return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    return send
+
+
+def copy_message(from_chat_id: int, message_id: int, **kwargs: Any) -> Sender:
+    """Копия сообщения каждому получателю.
+
+    Telegram копирует сообщение на своей стороне: форматирование и медиа
+    сохраняются, файлы не загружаются заново. Исходное сообщение должно
+    существовать до конца рассылки.
+    """
+    async def send(bot: Bot, chat_id: int) -> Any:
+        return await bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=from_chat_id,
+            message_id=message_id,
+            **kwargs
+        )
+    return send
+
+
+def classify(error: Exception) -> str:
+    """Категория ошибки отправки: blocked, deactivated, transient или failed"""
+    if isinstance(error, TelegramForbiddenError):
+        message = error.message.lower()
+        if "deactivated" in message:
+            return DEACTIVATED
+        return BLOCKED
+    if isinstance(error, (TelegramNotFound, TelegramBadRequest)):
+        if "chat not found" in error.message.lower():
+            return DEACTIVATED
+        return FAILED
+    if isinstance(error, (TelegramRetryAfter, TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)):
+        return TRANSIENT
+    return FAILED
+
+
+class BroadcastEngine:
+    """Рассылка с конкурентной отправкой под общим лимитом Telegram.
+
+    Не больше rate сообщений в секунду (Telegram допускает ~30 в личные
+    чаты) без начального всплеска и не больше concurrency одновременных
+    запросов. На
+    TelegramRetryAfter рассылка целиком ждёт retry_after, а этот чат
+    отправляется повторно; сетевые ошибки и 5xx повторяются с
+    экспоненциальной паузой. Заблокировавшие бота и удалённые аккаунты
+    считаются отдельно и не повторяются.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        retries: int = 3,
+        backoff: float = 1.0
+    ):
+        self.rate = rate or Config.BROADCAST_RATE
+        self.concurrency = concurrency or Config.BROADCAST_CONCURRENCY
+        self.retries = retries
+        self.backoff = backoff
+        self._resume_at = 0.0
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Прекратить рассылку: отправки в полёте завершатся, очередь отбрасывается"""
+        self._stopped = True
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    async def run(
+        self,
+        bot: Bot,
+        chat_ids: Union[Iterable[int], AsyncIterator[int]],
+        send: Sender,
+        on_progress: Optional[ProgressCallback] = None,
+        on_result: Optional[ResultCallback] = None
+    ) -> BroadcastResult:
+        # burst=1: отправки равномерно, без пачки в первую секунду
+        bucket = TokenBucket(self.rate, burst=1)
+        result = BroadcastResult()
+
+        async def handle(chat_id: int) -> None:
+            result.total += 1
+            kind, error = await self._deliver(bot, send, chat_id, bucket, result)
+            if on_result:
+                try:
+                    await on_result(chat_id, kind, error)
+                except Exception as e:
+                    logger.warning(f"Broadcast result callback failed: {str(e)}")
+            if on_progress:
+                try:
+                    await on_progress(result)
+                except Exception as e:
+                    logger.warning(f"Broadcast progress callback failed: {str(e)}")
+
+        try:
+            await run_workers(chat_ids, handle, self.concurrency, stopped=lambda: self._stopped)
+        finally:
+            result.finished = True
+            logger.info(
+                f"Broadcast: {result.sent}/{result.total} sent, {result.blocked} blocked, "
+                f"{result.deactivated} deactivated, {result.failed} failed, "
+                f"{result.retries} retries in {result.elapsed:.1f}s"
+            )
+        return result
+
+    async def _deliver(
+        self,
+        bot: Bot,
+        send: Sender,
+        chat_id: int,
+        bucket: TokenBucket,
+        result: BroadcastResult
+    ) -> Tuple[str, Optional[str]]:
+        """Отправить одному получателю; возвращает категорию и текст ошибки"""
+        async def before_attempt() -> None:
+            await self._wait_resume()
+            await bucket.acquire()
+
+        def on_retry(error: Exception, attempt: int) -> Optional[float]:
+            result.retries += 1
+            if isinstance(error, TelegramRetryAfter):
+                # Ждёт вся рассылка (в before_attempt), а не только этот чат
+                self._resume_at = max(self._resume_at, time.monotonic() + error.retry_after)
+                logger.warning(f"Broadcast flood control: waiting {error.retry_after}s")
+                return 0
+            return None
+
+        try:
+            await call_with_retries(
+                lambda: send(bot, chat_id),
+                lambda error: classify(error) == TRANSIENT,
+                self.retries,
+                self.backoff,
+                before_attempt=before_attempt,
+                on_retry=on_retry
+            )
+        except Exception as e:
+            kind = classify(e)
+            error = str(e)[:200]
+            if kind == BLOCKED:
+                result.blocked += 1
+            elif kind == DEACTIVATED:
+                result.deactivated += 1
+            else:
+                kind = FAILED
+                result.failed += 1
+                result.errors[chat_id] = error
+            return kind, error
+        result.sent += 1
+        return SENT, None
+
+    async def _wait_resume(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# ================== Задания рассылки ==================
+class _JobProgress:
+    """Позиция и счётчики выполняемого задания.
+
+    pending - получатели, выданные в отправку, но ещё без итога; позиция
+    для сохранения не может перешагнуть самый младший из них.
+    """
+
+    def __init__(self, job: Dict[str, Any], counts: Dict[str, int]):
+        self.job_id = job['id']
+        self.position = job['cursor']
+        self.counts = {kind: counts.get(kind, 0) for kind in (SENT, BLOCKED, DEACTIVATED, FAILED)}
+        self.pending: Set[int] = set()
+        self.since_checkpoint = 0
+
+    def dispatch(self, chat_id: int) -> None:
+        self.pending.add(chat_id)
+        self.position = max(self.position, chat_id)
+
+    def checkpoint(self) -> int:
+        return min(self.pending) - 1 if self.pending else self.position
+
+
+class BroadcastWorker:
+    """Фоновое выполнение заданий рассылки, сохранённых в SQLite.
+
+    Задания выполняются по одному. Итог по каждому получателю пишется в
+    broadcast_deliveries, позиция и счётчики задания - каждые
+    checkpoint_every доставок. После перезапуска прерванное задание
+    (running) продолжается с сохранённой позиции, а получатели, которым
+    оно уже доставлялось, пропускаются.
+    """
+
+    def __init__(self, chunk: int = 500, checkpoint_every: int = 50, retry_delay: float = 5.0):
+        self.chunk = chunk
+        self.checkpoint_every = checkpoint_every
+        self.retry_delay = retry_delay
+        self.current: Optional[_JobProgress] = None
+        self._engine: Optional[BroadcastEngine] = None
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._closing = False
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._closing = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить после отправок в полёте; задание продолжится при следующем запуске"""
+        if self._task is None:
+            return
+        self._closing = True
+        if self._engine is not None:
+            self._engine.stop()
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def notify(self) -> None:
+        """Разбудить исполнителя (появилось новое или возобновлённое задание)"""
+        self._wake.set()
+
+    def progress(self, job_id: int) -> Optional[Dict[str, int]]:
+        """Счётчики выполняемого сейчас задания (свежее, чем в базе)"""
+        if self.current is not None and self.current.job_id == job_id:
+            return dict(self.current.counts)
+        return None
+
+    async def pause(self, job_id: int) -> bool:
+        ok = await Database().set_broadcast_status(job_id, 'paused', only_from=('pending', 'running'))
+        if ok:
+            self._stop_current(job_id)
+        return ok
+
+    async def resume(self, job_id: int) -> bool:
+        ok = await Database().set_broadcast_status(job_id, 'pending', only_from=('paused',))
+        if ok:
+            self.notify()
+        return ok
+
+    async def cancel(self, job_id: int) -> bool:
+        ok = await Database().set_broadcast_status(job_id, 'cancelled', only_from=('pending', 'running', 'paused'))
+        if ok:
+            self._stop_current(job_id)
+        return ok
+
+    def _stop_current(self, job_id: int) -> None:
+        if self._engine is not None and self.current is not None and self.current.job_id == job_id:
+            self._engine.stop()
+
+    async def _run(self) -> None:
+        db = Database()
+        while not self._closing:
+            self._wake.clear()
+            try:
+                job = await db.next_broadcast_job()
+                if job is None:
+                    await self._wake.wait()
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast worker failed: {str(e)}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        db = Database()
+        job_id = job['id']
+        if job['status'] == 'pending':
+            if not await db.set_broadcast_status(job_id, 'running', only_from=('pending',)):
+                return
+        else:
+            logger.info(f"Broadcast #{job_id}: resuming after {job['cursor']}")
+
+        progress = self.current = _JobProgress(job, await db.get_broadcast_counts(job_id))
+        engine = self._engine = BroadcastEngine()
+        reporter = self._reporter(job, sum(progress.counts.values()))
+
+        async def recipients() -> AsyncIterator[int]:
+            # Пачки читаются лениво, по мере освобождения очереди отправки
+            async for chunk in db.iter_recipients(after=job['cursor'], chunk=self.chunk):
+                delivered = await db.get_broadcast_delivered(job_id, chunk[0], chunk[-1])
+                for chat_id in chunk:
+                    # Бан мог случиться, пока пачка ждала очереди
+                    if chat_id in delivered or (await db.get_roles(chat_id))[2]:
+                        continue
+                    progress.dispatch(chat_id)
+                    yield chat_id
+                progress.position = max(progress.position, chunk[-1])
+
+        async def on_result(chat_id: int, kind: str, error: Optional[str]) -> None:
+            await db.add_broadcast_delivery(job_id, chat_id, kind, error)
+            progress.pending.discard(chat_id)
+            progress.counts[kind] += 1
+            progress.since_checkpoint += 1
+            if progress.since_checkpoint >= self.checkpoint_every:
+                progress.since_checkpoint = 0
+                await db.checkpoint_broadcast(job_id, progress.checkpoint(), progress.counts)
+            # После паузы или отмены сообщение уже показывает новый статус
+            if reporter is not None and not engine.stopped:
+                done = sum(progress.counts.values())
+                await reporter.update(done, done - progress.counts[SENT])
+
+        if job['source_message_id']:
+            send = copy_message(job['source_chat_id'], job['source_message_id'])
+        else:
+            send = text_message(job['text'])
+
+        try:
+            await engine.run(self._bot, recipients(), send, on_result=on_result)
+        finally:
+            # engine.run завершается (и при ошибке источника тоже) только после
+            # того, как все отправки в полёте записаны в broadcast_deliveries:
+            # позиция ниже и повтор задания не отправят их второй раз
+            await db.checkpoint_broadcast(job_id, progress.checkpoint(), progress.counts)
+            self.current = None
+            self._engine = None
+
+        if engine.stopped:
+            return
+        if await db.set_broadcast_status(job_id, 'done', only_from=('running',)):
+            await self._report(job, progress.counts)
+
+    def _reporter(self, job: Dict[str, Any], initial: int) -> Optional[ProgressReporter]:
+        """Прогресс задания в сообщении, из которого оно было запущено"""
+        if not job['status_chat_id']:
+            return None
+        markup = broadcast_job_kb({'id': job['id'], 'status': 'running'})
+
+        async def edit(text: str) -> None:
+            await self._bot.edit_message_text(
+                text=text,
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id'],
+                reply_markup=markup
+            )
+
+        title = AdminTexts.BROADCAST_PROGRESS.format(id=job['id'])
+        return ProgressReporter(edit, title, job['total'], initial=initial)
+
+    async def _report(self, job: Dict[str, Any], counts: Dict[str, int]) -> None:
+        """Итог рассылки в сообщение, из которого она была запущена"""
+        if not job['status_chat_id']:
+            return
+        total = sum(counts.values())
+        try:
+            await self._bot.edit_message_text(
+                text=AdminTexts.BROADCAST_SUCCESS.format(id=job['id'], total=total, **counts),
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id']
+            )
+        except Exception as e:
+            logger.warning(f"Broadcast #{job['id']} report failed: {str(e)}")
+
+
+broadcast_worker = BroadcastWorker()
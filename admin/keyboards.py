@@ -1,5 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from admin.texts import AdminButtons
+from admin.texts import AdminTexts, AdminButtons
 
 def admin_main_kb():
     """Главное меню админа (инлайн)"""
@@ -41,6 +41,44 @@ def cancel_kb():
         ]
     )
 
+def broadcast_start_kb():
+    """Ввод текста рассылки: задания и отмена"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=AdminButtons.BROADCAST_JOBS, callback_data="nav:broadcast:jobs")],
+            [InlineKeyboardButton(text=AdminButtons.CANCEL, callback_data="nav:cancel")]
+        ]
+    )
+
+def broadcast_jobs_kb(jobs):
+    """Список последних заданий рассылки"""
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"#{job['id']} {AdminTexts.BROADCAST_STATUSES.get(job['status'], job['status'])}",
+            callback_data=f"nav:broadcast:job:{job['id']}"
+        )]
+        for job in jobs
+    ]
+    buttons.append([InlineKeyboardButton(text=AdminButtons.BACK, callback_data="nav:main")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def broadcast_job_kb(job):
+    """Управление заданием рассылки"""
+    job_id = job['id']
+    controls = []
+    if job['status'] in ('pending', 'running'):
+        controls.append(InlineKeyboardButton(text=AdminButtons.PAUSE, callback_data=f"action:broadcast:job:pause:{job_id}"))
+    elif job['status'] == 'paused':
+        controls.append(InlineKeyboardButton(text=AdminButtons.RESUME, callback_data=f"action:broadcast:job:resume:{job_id}"))
+    if job['status'] in ('pending', 'running', 'paused'):
+        controls.append(InlineKeyboardButton(text=AdminButtons.CANCEL, callback_data=f"action:broadcast:job:cancel:{job_id}"))
+
+    buttons = [[InlineKeyboardButton(text=AdminButtons.REFRESH, callback_data=f"nav:broadcast:job:{job_id}")]]
+    if controls:
+        buttons.append(controls)
+    buttons.append([InlineKeyboardButton(text=AdminButtons.BACK, callback_data="nav:broadcast:jobs")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
 def confirm_broadcast_kb():
     """Подтверждение рассылки"""
     return InlineKeyboardMarkup(
@@ -52,12 +90,28 @@ def confirm_broadcast_kb():
         ]
     )
 
-def requests_list_kb(requests, offset=0, limit=10):
-    """Список заявок с пагинацией"""
+def requests_list_kb(page, counts):
+    """Список заявок с фильтром по статусу и keyset-пагинацией"""
     buttons = []
+    requests = page['requests']
+    status = page['status'] or "all"
+    
+    # Фильтр по статусу с количеством заявок
+    filters = []
+    for key, title in AdminButtons.REQUEST_FILTERS.items():
+        count = sum(counts.values()) if key == "all" else counts.get(key, 0)
+        mark = "• " if key == status else ""
+        filters.append(
+            InlineKeyboardButton(
+                text=f"{mark}{title} ({count})",
+                callback_data=f"nav:requests:st:{key}"
+            )
+        )
+    buttons.append(filters[:2])
+    buttons.append(filters[2:])
     
     # Кнопки заявок
-    for request in requests[offset:offset+limit]:
+    for request in requests:
         buttons.append(
             [InlineKeyboardButton(
                 text=f"#{request['id']} @{request['username']}",
@@ -65,20 +119,20 @@ def requests_list_kb(requests, offset=0, limit=10):
             )]
         )
     
-    # Пагинация
+    # Пагинация: курсором служит id крайней заявки на странице
     pagination = []
-    if offset > 0:
+    if requests and page['has_prev']:
         pagination.append(
             InlineKeyboardButton(
                 text="⬅️ Назад",
-                callback_data=f"nav:requests:page:{max(0, offset-limit)}"
+                callback_data=f"nav:requests:prev:{status}:{requests[0]['id']}"
             )
         )
-    if offset + limit < len(requests):
+    if requests and page['has_next']:
         pagination.append(
             InlineKeyboardButton(
                 text="Вперёд ➡️",
-                callback_data=f"nav:requests:page:{offset+limit}"
+                callback_data=f"nav:requests:next:{status}:{requests[-1]['id']}"
             )
         )
     if pagination:
@@ -114,12 +168,13 @@ def request_actions_kb(request_id):
         ]
     )
 
-def users_list_kb(users, offset=0, limit=10):
-    """Список пользователей с пагинацией"""
+def users_list_kb(page):
+    """Список пользователей с keyset-пагинацией (страница из Database.get_users_page)"""
     buttons = []
+    users = page['users']
     
     # Кнопки пользователей
-    for user in users[offset:offset+limit]:
+    for user in users:
         status_icon = "🟢" if not user.get('is_banned', False) else "🔴"
         buttons.append(
             [InlineKeyboardButton(
@@ -128,20 +183,20 @@ def users_list_kb(users, offset=0, limit=10):
             )]
         )
     
-    # Пагинация
+    # Пагинация: курсором служит username крайнего пользователя на странице
     pagination = []
-    if offset > 0:
+    if users and page['has_prev']:
         pagination.append(
             InlineKeyboardButton(
                 text="⬅️ Назад",
-                callback_data=f"nav:users:page:{max(0, offset-limit)}"
+                callback_data=f"nav:users:prev:{users[0]['username']}"
             )
         )
-    if offset + limit < len(users):
+    if users and page['has_next']:
         pagination.append(
             InlineKeyboardButton(
                 text="Вперёд ➡️",
-                callback_data=f"nav:users:page:{offset+limit}"
+                callback_data=f"nav:users:next:{users[-1]['username']}"
             )
         )
     if pagination:
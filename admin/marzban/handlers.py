@@ -1,14 +1,52 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 from marzban.api import MarzbanAPI
+from marzban.bulk import (
+    BulkRunner,
+    BulkResult,
+    select_usernames,
+    reset_traffic,
+    revoke_subscription,
+    extend_expire,
+    add_data_limit
+)
+from marzban.metrics import client_metrics
+from marzban.mirror import users_mirror
+from marzban.nodes import node_monitor
+from marzban.sampler import stats_sampler, summarize, sparkline
+from middlewares import RoleFilter
+from utils import ProgressReporter
 from .texts import *
 from .keyboards import *
+import html
 import logging
+import time
+from datetime import datetime
 
 router = Router()
+# Весь раздел Marzban - только для администраторов
+router.message.filter(RoleFilter(admin=True))
+router.callback_query.filter(RoleFilter(admin=True))
 logger = logging.getLogger(__name__)
 
+# Операции, доступные из меню массовых действий
+BULK_ACTIONS = {
+    "reset": reset_traffic,
+    "revoke": revoke_subscription,
+    "extend30": extend_expire(30 * 24 * 3600),
+    "addgb10": add_data_limit(10 * 1024**3)
+}
+
+# Окна истории на экране статистики
+STATS_WINDOWS = (("За час", 3600), ("За сутки", 24 * 3600))
+
+class BulkStates(StatesGroup):
+    waiting_usernames = State()
+
 def safe_divide(value: int, divisor: int, default=0) -> float:
     """Безопасное деление с защитой от None и нуля"""
     if value is None or divisor is None or divisor == 0:
@@ -25,6 +63,44 @@ def format_size(bytes_size: int) -> str:
             return f"{safe_divide(bytes_size, divisor):.2f} {unit}"
     return f"{bytes_size} B"
 
+def format_expire(expire: int) -> str:
+    """Дата окончания подписки (None - бессрочно)"""
+    if not expire:
+        return "∞"
+    return datetime.fromtimestamp(expire).strftime("%d.%m.%Y %H:%M")
+
+def format_latency(seconds: float) -> str:
+    """Оценка квантиля из гистограммы в читаемом виде"""
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return ">30s"
+    return f"≤{seconds * 1000:.0f}ms"
+
+def render_metrics() -> str:
+    rows = client_metrics.summary()
+    if not rows:
+        return METRICS_TITLE + METRICS_EMPTY
+    
+    text = METRICS_TITLE
+    for row in rows[:15]:
+        text += METRICS_LINE.format(
+            html.escape(row['endpoint']),
+            row['count'],
+            format_latency(row['p50']),
+            format_latency(row['p95']),
+            format_latency(row['p99']),
+            row['errors'],
+            row['retries']
+        )
+    coalescing = MarzbanAPI.coalescing_stats()
+    breaker = MarzbanAPI.breaker
+    return (
+        text
+        + METRICS_COALESCING.format(coalescing['hits'], coalescing['misses'])
+        + METRICS_BREAKER.format(BREAKER_STATES.get(breaker.state, breaker.state), breaker.rejected)
+    )
+
 @router.callback_query(F.data == "admin:marzban")
 async def marzban_main(callback: CallbackQuery):
     await callback.message.edit_text(
@@ -34,17 +110,41 @@ async def marzban_main(callback: CallbackQuery):
 
 @router.callback_query(F.data == "marzban:stats")
 async def show_stats(callback: CallbackQuery):
+    """Статистика строится из истории сборщика, без запроса к панели"""
     try:
-        api = MarzbanAPI()
-        stats = api.get_system_stats() or {}
+        history = stats_sampler.history
+        await stats_sampler.ensure_loaded()
+        if history.latest() is None:
+            # Сборщик еще не успел сделать ни одного замера
+            await stats_sampler.sample()
+        latest = history.latest()
+        stats = stats_sampler.last_stats
+        
+        # Общее число пользователей в истории не хранится: после перезапуска
+        # оно неизвестно до первого успешного замера
+        text = SERVER_STATS_TITLE + STATS_TEMPLATE.format(
+            f"{latest['cpu']:.1f}",
+            f"{latest['mem']:.1f}",
+            STATS_TOTAL_USERS.format(stats.total_user) if stats is not None else "",
+            int(latest['active'])
+        )
+        for title, seconds in STATS_WINDOWS:
+            window = history.window(seconds)
+            cpu, mem = summarize(window['cpu']), summarize(window['mem'])
+            if cpu is None:
+                continue
+            text += STATS_WINDOW_TEMPLATE.format(
+                title,
+                len(window['cpu']),
+                cpu['min'], cpu['avg'], cpu['max'],
+                sparkline(window['cpu']),
+                mem['min'], mem['avg'], mem['max'],
+                sparkline(window['mem'])
+            )
+        text += STATS_UPDATED.format(int(time.time() - latest['ts']))
         
         await callback.message.edit_text(
-            SERVER_STATS_TITLE + STATS_TEMPLATE.format(
-                stats.get('cpu_usage', 'N/A'),
-                stats.get('memory_usage', 'N/A'),
-                stats.get('total_users', 0),
-                stats.get('active_users', 0)
-            ),
+            text,
             reply_markup=marzban_main_kb(),
 		parse_mode="HTML"
         )
@@ -52,6 +152,43 @@ async def show_stats(callback: CallbackQuery):
         logger.error(f"Stats error: {e}", exc_info=True)
         await callback.answer("Ошибка загрузки статистики")
 
+@router.callback_query(F.data == "marzban:nodes")
+async def show_nodes(callback: CallbackQuery):
+    """Экран узлов строится из снимка фонового опроса, без запроса к панели"""
+    if node_monitor.updated_at is None:
+        text = NODES_TITLE + NODES_EMPTY
+    else:
+        lines = [
+            NODE_LINE.format(
+                NODE_STATUS_ICONS.get(node.status, '⚪'),
+                html.escape(node.name),
+                html.escape(node.address),
+                node.status
+            )
+            for _, node in sorted(node_monitor.nodes.items())
+        ]
+        text = NODES_TITLE + "\n".join(lines)
+        text += NODES_UPDATED.format(int(time.time() - node_monitor.updated_at))
+    
+    if node_monitor.last_error:
+        text += NODES_POLL_ERROR.format(html.escape(node_monitor.last_error[:200]))
+    
+    if node_monitor.transitions:
+        text += NODES_TRANSITIONS_TITLE
+        for changed_at, name, old, new in reversed(node_monitor.transitions):
+            text += "\n" + NODE_TRANSITION_LINE.format(
+                time.strftime("%d.%m %H:%M", time.localtime(changed_at)),
+                html.escape(name),
+                old,
+                new
+            )
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=nodes_kb(), parse_mode="HTML")
+    except TelegramBadRequest:
+        # Повторное нажатие "Обновить" без изменений
+        await callback.answer()
+
 @router.callback_query(F.data == "marzban:users")
 async def first_users_page(callback: CallbackQuery):
     await show_users_page(callback, 0)
@@ -68,12 +205,11 @@ async def specific_users_page(callback: CallbackQuery):
 
 async def show_users_page(callback: CallbackQuery, page: int):
     try:
-        api = MarzbanAPI()
-        users = api.get_users() or []
+        users, total = await users_mirror.get_page(page, USERS_PER_PAGE)
         
         await callback.message.edit_text(
-            USER_LIST_TITLE.format(len(users)),
-            reply_markup=users_list_kb(users, page)
+            USER_LIST_TITLE.format(total),
+            reply_markup=users_list_kb(users, page, total)
         )
     except Exception as e:
         logger.error(f"Users page error: {e}", exc_info=True)
@@ -84,7 +220,7 @@ async def show_user_details(callback: CallbackQuery):
     try:
         username = callback.data.split(":")[2]
         api = MarzbanAPI()
-        user = api.get_user(username)
+        user = await api.get_user(username)
         
         if not user:
             await callback.answer("Пользователь не найден")
@@ -92,12 +228,12 @@ async def show_user_details(callback: CallbackQuery):
         
         await callback.message.edit_text(
             USER_DETAILS_TITLE + USER_DETAILS.format(
-                user.get('username', 'N/A'),
-                USER_STATUS_ICONS.get(user.get('status'), '⚪'),
-                format_size(user.get('data_limit')),
-                format_size(user.get('used_traffic')),
-                user.get('expire_date', '∞'),
-		user.get('sub_last_user_agent', 'Не удалось определить')
+                user.username,
+                USER_STATUS_ICONS.get(user.status, '⚪'),
+                format_size(user.data_limit),
+                format_size(user.used_traffic),
+                format_expire(user.expire),
+		user.sub_last_user_agent or 'Не удалось определить'
             ),
             reply_markup=user_actions_kb(username),
 	    parse_mode="HTML"
@@ -105,3 +241,129 @@ async def show_user_details(callback: CallbackQuery):
     except Exception as e:
         logger.error(f"User details error: {e}", exc_info=True)
         await callback.answer("Ошибка загрузки данных")
+
+# ================== Массовые операции ==================
+@router.callback_query(F.data == "marzban:bulk")
+async def bulk_menu(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text(
+        BULK_MENU_TITLE,
+        reply_markup=bulk_operations_kb()
+    )
+
+@router.callback_query(F.data.startswith("marzban:bulk:op:"))
+async def bulk_choose_selector(callback: CallbackQuery):
+    op = callback.data.split(":")[3]
+    if op not in BULK_ACTIONS:
+        return await callback.answer("Неизвестная операция")
+    
+    await callback.message.edit_text(
+        BULK_SELECT_TITLE.format(BULK_OPERATIONS[op]),
+        reply_markup=bulk_selectors_kb(op)
+    )
+
+@router.callback_query(F.data.startswith("marzban:bulk:sel:"))
+async def bulk_confirm(callback: CallbackQuery, state: FSMContext):
+    op, selector = callback.data.split(":", 4)[3:]
+    if op not in BULK_ACTIONS or selector not in BULK_SELECTORS:
+        return await callback.answer("Неизвестная операция")
+    
+    if selector == "list":
+        await state.set_state(BulkStates.waiting_usernames)
+        await state.update_data(bulk_op=op)
+        await callback.message.edit_text(BULK_ENTER_LIST)
+        return
+    
+    await callback.message.edit_text(
+        BULK_CONFIRM.format(BULK_OPERATIONS[op], BULK_SELECTORS[selector]),
+        reply_markup=bulk_confirm_kb(op, selector),
+        parse_mode="HTML"
+    )
+
+@router.message(BulkStates.waiting_usernames)
+async def bulk_process_usernames(message: Message, state: FSMContext):
+    usernames = list(dict.fromkeys((message.text or "").split()))
+    if not usernames:
+        return await message.answer(BULK_EMPTY_LIST)
+    
+    data = await state.get_data()
+    await state.update_data(bulk_usernames=usernames)
+    await message.answer(
+        BULK_CONFIRM.format(
+            BULK_OPERATIONS[data['bulk_op']],
+            BULK_LIST_SELECTION.format(BULK_SELECTORS["list"], len(usernames))
+        ),
+        reply_markup=bulk_confirm_kb(data['bulk_op'], "list"),
+        parse_mode="HTML"
+    )
+
+@router.callback_query(F.data.startswith("marzban:bulk:run:"))
+async def bulk_run(callback: CallbackQuery, state: FSMContext):
+    op, selector = callback.data.split(":", 4)[3:]
+    if op not in BULK_ACTIONS or selector not in BULK_SELECTORS:
+        return await callback.answer("Неизвестная операция")
+    
+    total = None
+    if selector == "list":
+        usernames = (await state.get_data()).get('bulk_usernames', [])
+        total = len(usernames)
+        source = select_usernames(usernames=usernames)
+    elif selector == "linked":
+        source = select_usernames(linked=True)
+    else:
+        source = select_usernames(status=selector.split(":")[1] if ":" in selector else None)
+    await state.clear()
+    await callback.answer()
+    
+    title = BULK_OPERATIONS[op]
+    reporter = ProgressReporter(callback.message.edit_text, title, total)
+    
+    async def on_progress(result: BulkResult):
+        await reporter.update(result.done, len(result.failed))
+    
+    try:
+        result = await BulkRunner().run(op, BULK_ACTIONS[op], source, on_progress)
+    except Exception as e:
+        logger.error(f"Bulk operation error: {e}", exc_info=True)
+        await callback.message.answer("Ошибка выполнения массовой операции")
+        return
+    
+    failures = "\n".join(
+        BULK_FAILED_LINE.format(html.escape(username), html.escape(error))
+        for username, error in list(result.failed.items())[:10]
+    )
+    await callback.message.edit_text(
+        BULK_RESULT.format(
+            title,
+            result.succeeded,
+            result.total,
+            len(result.failed),
+            result.retries,
+            result.elapsed
+        ) + (BULK_ABORTED.format(html.escape(result.error)) if result.error else "") + failures,
+        reply_markup=marzban_main_kb(),
+        parse_mode="HTML"
+    )
+
+# ================== Метрики клиента ==================
+@router.message(Command("metrics"))
+async def metrics_command(message: Message):
+    await message.answer(render_metrics(), reply_markup=metrics_kb(), parse_mode="HTML")
+
+@router.callback_query(F.data == "marzban:metrics")
+async def show_metrics(callback: CallbackQuery):
+    try:
+        await callback.message.edit_text(render_metrics(), reply_markup=metrics_kb(), parse_mode="HTML")
+    except TelegramBadRequest:
+        await callback.answer()
+
+@router.callback_query(F.data == "marzban:metrics:export")
+async def export_metrics(callback: CallbackQuery):
+    """Метрики в формате Prometheus одним файлом"""
+    payload = client_metrics.export_prometheus(
+        extra={f"coalescing_{name}": value for name, value in MarzbanAPI.coalescing_stats().items()}
+    )
+    await callback.message.answer_document(
+        BufferedInputFile(payload.encode(), filename="marzban_metrics.prom")
+    )
+    await callback.answer()
@@ -7,22 +7,29 @@ def marzban_main_kb():
         InlineKeyboardButton(text=SERVER_STATS_BTN, callback_data="marzban:stats"),
         InlineKeyboardButton(text=PROXY_USERS_BTN, callback_data="marzban:users"),
     )
+    builder.row(
+        InlineKeyboardButton(text=NODES_BTN, callback_data="marzban:nodes"),
+        InlineKeyboardButton(text=BULK_BTN, callback_data="marzban:bulk")
+    )
+    builder.row(
+        InlineKeyboardButton(text=METRICS_BTN, callback_data="marzban:metrics")
+    )
     builder.row(
         InlineKeyboardButton(text=BACK_TO_MAIN_BTN, callback_data="nav:main")
     )
     return builder.as_markup()
 
-def users_list_kb(users: list, page: int = 0, per_page: int = 9):
+USERS_PER_PAGE = 9
+
+def users_list_kb(page_users: list, page: int = 0, total: int = 0, per_page: int = USERS_PER_PAGE):
     builder = InlineKeyboardBuilder()
     
-    if not users:
+    if not page_users:
         builder.button(text="❌ Нет пользователей", callback_data="none")
         return builder.as_markup()
     
-    # Текущая страница
-    start_idx = page * per_page
-    end_idx = start_idx + per_page
-    page_users = users[start_idx:end_idx]
+    # Текущая страница (срез уже сделан зеркалом)
+    end_idx = page * per_page + len(page_users)
     
     # Добавляем кнопки по 3 в ряд
     for i in range(0, len(page_users), 3):
@@ -30,23 +37,23 @@ def users_list_kb(users: list, page: int = 0, per_page: int = 9):
         buttons = [
             InlineKeyboardButton(
                 text=USER_BUTTON_TEMPLATE.format(
-                    USER_STATUS_ICONS.get(user.get('status', 'active'), '⚪'),
-                    user.get('username', 'N/A')
+                    USER_STATUS_ICONS.get(user.status, '⚪'),
+                    user.username
                 ),
-                callback_data=f"marzban:user:{user['username']}"
+                callback_data=f"marzban:user:{user.username}"
             )
             for user in row
         ]
         builder.row(*buttons)
     
     # Пагинация
-    if len(users) > per_page:
+    if total > per_page:
         nav_buttons = []
         if page > 0:
             nav_buttons.append(
                 InlineKeyboardButton(text="◀️ Назад", callback_data=f"marzban:users:{page-1}")
             )
-        if end_idx < len(users):
+        if end_idx < total:
             nav_buttons.append(
                 InlineKeyboardButton(text="Вперед ▶️", callback_data=f"marzban:users:{page+1}")
             )
@@ -69,3 +76,52 @@ def user_actions_kb(username: str):
         InlineKeyboardButton(text="🔙 К списку", callback_data="marzban:users:0")
     )
     return builder.as_markup()
+
+def bulk_operations_kb():
+    builder = InlineKeyboardBuilder()
+    for op, title in BULK_OPERATIONS.items():
+        builder.row(
+            InlineKeyboardButton(text=title, callback_data=f"marzban:bulk:op:{op}")
+        )
+    builder.row(
+        InlineKeyboardButton(text="🔙 Назад", callback_data="admin:marzban")
+    )
+    return builder.as_markup()
+
+def bulk_selectors_kb(op: str):
+    builder = InlineKeyboardBuilder()
+    for selector, title in BULK_SELECTORS.items():
+        builder.row(
+            InlineKeyboardButton(text=title, callback_data=f"marzban:bulk:sel:{op}:{selector}")
+        )
+    builder.row(
+        InlineKeyboardButton(text="🔙 Назад", callback_data="marzban:bulk")
+    )
+    return builder.as_markup()
+
+def bulk_confirm_kb(op: str, selector: str):
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Запустить", callback_data=f"marzban:bulk:run:{op}:{selector}"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="marzban:bulk"),
+    )
+    return builder.as_markup()
+
+def nodes_kb():
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔄 Обновить", callback_data="marzban:nodes"),
+        InlineKeyboardButton(text="🔙 Назад", callback_data="admin:marzban")
+    )
+    return builder.as_markup()
+
+def metrics_kb():
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🔄 Обновить", callback_data="marzban:metrics"),
+        InlineKeyboardButton(text=METRICS_EXPORT_BTN, callback_data="marzban:metrics:export")
+    )
+    builder.row(
+        InlineKeyboardButton(text="🔙 Назад", callback_data="admin:marzban")
+    )
+    return builder.as_markup()
@@ -30,6 +30,81 @@ SERVER_STATS_TITLE = "📊 Статистика сервера\n"
 STATS_TEMPLATE = """
 <b>CPU:</b> {}%
 <b>Память:</b> {}%
-<b>Пользователей:</b> {}
-<b>Активных:</b> {}
+{}<b>Активных:</b> {}
 """
+STATS_TOTAL_USERS = "<b>Пользователей:</b> {}\n"
+STATS_WINDOW_TEMPLATE = """
+<b>{}</b> (замеров: {})
+CPU: мин {:.0f}% / ср {:.0f}% / макс {:.0f}%
+<code>{}</code>
+Память: мин {:.0f}% / ср {:.0f}% / макс {:.0f}%
+<code>{}</code>
+"""
+STATS_UPDATED = "\n<i>Замер {} с назад</i>"
+
+# Массовые операции
+BULK_BTN = "📦 Массовые операции"
+BULK_MENU_TITLE = "📦 Массовые операции\nВыберите действие:"
+BULK_OPERATIONS = {
+    "reset": "🔄 Сбросить трафик",
+    "revoke": "🔑 Перевыпустить подписку",
+    "extend30": "📅 Продлить на 30 дней",
+    "addgb10": "➕ Добавить 10 GB"
+}
+BULK_SELECTORS = {
+    "status:active": "🟢 Активные",
+    "status:expired": "🔴 Истекшие",
+    "status:limited": "🟡 Исчерпавшие лимит",
+    "status:disabled": "⚫ Отключенные",
+    "all": "👥 Все пользователи",
+    "linked": "🤖 Привязанные в боте",
+    "list": "📝 Список имен"
+}
+BULK_SELECT_TITLE = "{}\nК кому применить?"
+BULK_ENTER_LIST = "📝 Отправьте имена пользователей через пробел или с новой строки:"
+BULK_EMPTY_LIST = "Список пуст, отправьте хотя бы одно имя"
+BULK_CONFIRM = """
+<b>Массовая операция:</b> {}
+<b>Пользователи:</b> {}
+Подтвердите запуск:
+"""
+BULK_RESULT = """
+<b>Готово:</b> {}
+<b>Успешно:</b> {}/{}
+<b>Ошибок:</b> {}
+<b>Повторов:</b> {}
+<b>Время:</b> {:.1f} с
+"""
+BULK_FAILED_LINE = "• {}: {}"
+BULK_LIST_SELECTION = "{} ({})"
+BULK_ABORTED = "⚠️ <b>Прервано:</b> {}\n"
+
+# Узлы
+NODES_BTN = "🖥 Узлы"
+NODES_TITLE = "🖥 Узлы Marzban\n"
+NODES_EMPTY = "Данных об узлах пока нет"
+NODE_LINE = "{} <b>{}</b> ({}) — {}"
+NODES_UPDATED = "\n<i>Обновлено {} с назад</i>"
+NODES_POLL_ERROR = "\n⚠️ Последний опрос не удался: {}"
+NODES_TRANSITIONS_TITLE = "\n<b>Последние изменения:</b>"
+NODE_TRANSITION_LINE = "{} {}: {} → {}"
+NODE_STATUS_ICONS = {
+    "connected": "🟢",
+    "connecting": "🟡",
+    "error": "🔴",
+    "disabled": "⚫"
+}
+
+# Метрики клиента
+METRICS_BTN = "📈 Метрики API"
+METRICS_EXPORT_BTN = "📤 Экспорт"
+METRICS_TITLE = "📈 Метрики клиента Marzban\n"
+METRICS_EMPTY = "Запросов к панели еще не было"
+METRICS_LINE = "\n<code>{}</code>\n{} запр. · p50 {} · p95 {} · p99 {} · ошибок {} · повторов {}"
+METRICS_COALESCING = "\n\n<b>Объединение чтений:</b> присоединились {}, запросов {}"
+METRICS_BREAKER = "\n<b>Предохранитель:</b> {} (отклонено запросов: {})"
+BREAKER_STATES = {
+    "closed": "🟢 закрыт",
+    "open": "🔴 открыт",
+    "half_open": "🟡 проверка"
+}
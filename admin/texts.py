@@ -14,6 +14,8 @@ class AdminTexts:
     
     # Работа с заявками
     REQUESTS_LIST = "📋 Список заявок:"
+    REQUESTS_LIST_TOTAL = "📋 Заявки: {filter} (всего: {total})"
+    NO_REQUESTS = "Нет заявок"
     REQUEST_DETAIL = (
         "📄 Заявка #{id}\n"
         "┌ Пользователь: {username}\n"
@@ -26,6 +28,7 @@ class AdminTexts:
     
     # Управление пользователями
     USERS_LIST = "👥 Список пользователей:"
+    USERS_LIST_TOTAL = "👥 Список пользователей (всего: {total}):"
     USER_DETAIL = (
         "👤 Пользователь #{id}\n"
         "┌ Ник: @{username}\n"
@@ -37,7 +40,8 @@ class AdminTexts:
     USER_UNBANNED = "🟢 Пользователь @{username} разблокирован"
     
     # Рассылка
-    BROADCAST_START = "📢 Введите текст рассылки:"
+    BROADCAST_START = "📢 Отправьте сообщение для рассылки (текст, фото, видео или документ):"
+    BROADCAST_MEDIA = "[вложение: {type}]"
     BROADCAST_CONFIRM = (
         "Подтвердите рассылку:\n"
         "➖➖➖\n"
@@ -45,8 +49,37 @@ class AdminTexts:
         "➖➖➖\n"
         "Получателей: {count}"
     )
-    BROADCAST_SUCCESS = "✅ Рассылка завершена (доставлено: {success}/{total})"
+    BROADCAST_SUCCESS = (
+        "✅ Рассылка #{id} завершена\n"
+        "┌ Доставлено: {sent}/{total}\n"
+        "├ Заблокировали бота: {blocked}\n"
+        "├ Удалённые аккаунты: {deactivated}\n"
+        "└ Ошибки: {failed}"
+    )
     BROADCAST_CANCELLED = "❌ Рассылка отменена"
+    BROADCAST_QUEUED = "📨 Рассылка #{id} поставлена в очередь"
+    BROADCAST_PROGRESS = "Рассылка #{id}"
+    BROADCAST_JOBS = "📋 Задания рассылки:"
+    BROADCAST_NO_JOBS = "Заданий рассылки пока нет"
+    BROADCAST_JOB = (
+        "📢 Рассылка #{id} - {status}\n"
+        "┌ Обработано: {done}/{total}\n"
+        "├ Доставлено: {sent}\n"
+        "├ Заблокировали бота: {blocked}\n"
+        "├ Удалённые аккаунты: {deactivated}\n"
+        "└ Ошибки: {failed}\n"
+        "➖➖➖\n"
+        "{text}"
+    )
+    BROADCAST_JOB_NOT_FOUND = "Задание не найдено"
+    BROADCAST_JOB_STATUS_CHANGED = "Статус задания уже изменился"
+    BROADCAST_STATUSES = {
+        "pending": "⏳ в очереди",
+        "running": "▶️ идёт",
+        "paused": "⏸ на паузе",
+        "cancelled": "✖️ отменена",
+        "done": "✅ завершена",
+    }
     MODER_WELCOME = (
         "🛠 Вы вошли как модератор\n"
         "Доступные вам функции:"
@@ -70,6 +103,18 @@ class AdminButtons:
     REJECT = "❌ Отклонить"
     BAN = "🚫 Забанить"
     UNBAN = "🟢 Разбанить"
+    BROADCAST_JOBS = "📋 Задания рассылки"
+    PAUSE = "⏸ Пауза"
+    RESUME = "▶️ Продолжить"
+    REFRESH = "🔄 Обновить"
     NEXT = "⏭ Далее"
     PREV = "⏮ Назад"
+    
+    # Фильтр заявок по статусу
+    REQUEST_FILTERS = {
+        "all": "📋 Все",
+        "pending": "⏳ Новые",
+        "approved": "✅ Одобренные",
+        "rejected": "❌ Отклонённые",
+    }
 
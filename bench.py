@@ -0,0 +1,199 @@
+"""Нагрузочный бенчмарк клиента Marzban и обработчиков бота.
+
+Поднимает локальную замену панели (marzban.fake_server) и временную БД,
+поэтому живая панель и marzban_bot.db не затрагиваются.
+
+    python bench.py --users 20000 --latency 0.02 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List
+
+# Конфиг читается при импорте: задаем окружение заранее
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("MARZBAN_USERNAME", "bench")
+os.environ.setdefault("MARZBAN_PASSWORD", "bench")
+os.environ.setdefault("ADMIN_ID", "1")
+os.environ["MARZBAN_URL"] = "http://127.0.0.1"
+
+from config import Config
+from database import Database
+from marzban.fake_server import FakeMarzban
+
+
+def print_header(title):
+    print(f"\n{'='*60}")
+    print(f"{title.upper():^60}")
+    print(f"{'='*60}")
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def report(name: str, latencies: List[float], errors: int, elapsed: float):
+    ms = [x * 1000 for x in latencies]
+    print(
+        f"{name:<28} {len(latencies):>6} req  {len(latencies) / elapsed:>9.1f} req/s  "
+        f"p50 {percentile(ms, 50):>7.1f}  p95 {percentile(ms, 95):>7.1f}  "
+        f"p99 {percentile(ms, 99):>7.1f} ms  errors {errors}"
+    )
+
+
+async def run_scenario(
+    name: str,
+    call: Callable[[int], Awaitable[bool]],
+    requests: int,
+    concurrency: int
+):
+    """Выполнить call(i) requests раз, не более concurrency одновременно"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report(name, latencies, errors, time.perf_counter() - started)
+
+
+async def _ok(coro: Awaitable) -> bool:
+    return await coro is not None
+
+
+# ================== Заглушки апдейтов Telegram ==================
+class BenchMessage:
+    async def edit_text(self, *args, **kwargs):
+        return None
+
+    async def answer(self, *args, **kwargs):
+        return None
+
+
+class BenchCallback:
+    """Минимальный CallbackQuery: обработчик сообщает об ошибке через answer(text)"""
+
+    def __init__(self, data: str, user_id: int):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = BenchMessage()
+        self.failed = False
+
+    async def answer(self, text: str = None, **kwargs):
+        if text:
+            self.failed = True
+
+
+async def main(args: argparse.Namespace):
+    server = FakeMarzban(users=args.users, latency=args.latency, error_rate=args.errors)
+    Config.MARZBAN_URL = await server.start()
+
+    db_dir = tempfile.mkdtemp(prefix="marzban_bench_")
+    db = Database(os.path.join(db_dir, "bench.db"))
+    await db.connect()
+    usernames = list(server.users)
+    linked = usernames[:min(len(usernames), args.linked)]
+    for tg_id, username in enumerate(linked, start=1):
+        await db.update_telegram_id(username, tg_id)
+
+    # Обработчики импортируются после настройки БД (Database - синглтон)
+    from marzban.api import MarzbanAPI
+    from admin.marzban.handlers import show_users_page, show_user_details
+    from user.user_router import show_subscription
+
+    api = MarzbanAPI()
+    n, c = args.requests, args.concurrency
+    print_header(f"fake marzban: {len(usernames)} users, latency {args.latency}s, errors {args.errors:.0%}")
+
+    try:
+        print_header("client")
+        await run_scenario(
+            "get_user (distinct)",
+            lambda i: _ok(api.get_user(usernames[i % len(usernames)])), n, c
+        )
+        await run_scenario(
+            "get_user (same user)",
+            lambda i: _ok(api.get_user(usernames[0])), n, c
+        )
+        await run_scenario(
+            "get_users (page of 100)",
+            lambda i: _ok(api.get_users(offset=(i * 100) % len(usernames))), max(1, n // 10), c
+        )
+        await run_scenario("get_system_stats", lambda i: _ok(api.get_system_stats()), n, c)
+
+        started = time.perf_counter()
+        count = errors = 0
+        try:
+            async for _ in api.iter_users(prefetch=args.prefetch):
+                count += 1
+        except Exception:
+            # Страница не удалась и после повторов: поток оборван
+            errors = 1
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'iter_users (full stream)':<28} {count:>6} users {count / elapsed:>9.1f} users/s  "
+            f"total {elapsed:.2f} s  errors {errors}"
+        )
+
+        print_header("handlers")
+
+        async def users_page(i: int) -> bool:
+            callback = BenchCallback(f"marzban:users:{i % 50}", 1)
+            await show_users_page(callback, i % 50)
+            return not callback.failed
+
+        async def user_details(i: int) -> bool:
+            callback = BenchCallback(f"marzban:user:{usernames[i % len(usernames)]}", 1)
+            await show_user_details(callback)
+            return not callback.failed
+
+        async def subscription(i: int) -> bool:
+            callback = BenchCallback("my_subscription", i % len(linked) + 1)
+            await show_subscription(callback)
+            return not callback.failed
+
+        await run_scenario("admin users page", users_page, n, c)
+        await run_scenario("admin user details", user_details, n, c)
+        await run_scenario("user subscription", subscription, n, c)
+
+        print_header("server")
+        print(f"HTTP requests served: {server.requests}, logins: {server.logins}")
+        print(f"Coalescing: {MarzbanAPI.coalescing_stats()}")
+    finally:
+        await MarzbanAPI.close()
+        await db._cleanup()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Marzban bot benchmark")
+    parser.add_argument("--users", type=int, default=5000, help="пользователей в фейковой панели")
+    parser.add_argument("--linked", type=int, default=500, help="из них привязано к Telegram в БД")
+    parser.add_argument("--latency", type=float, default=0.01, help="задержка панели, с")
+    parser.add_argument("--errors", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--requests", type=int, default=1000, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--prefetch", type=int, default=4)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(1)
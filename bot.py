@@ -10,7 +10,12 @@ from admin.marzban.handlers import router as marzban_router
 from user.user_router import user_router
 from user.keyboards import get_user_main_menu
 from admin.admin_actions import AdminActions
-from admin.keyboards import admin_main_kb
+from admin.keyboards import admin_main_kb, moder_kb
+from marzban.api import MarzbanAPI
+from marzban.nodes import node_monitor
+from marzban.sampler import stats_sampler
+from middlewares import setup_middlewares
+from admin.broadcast import broadcast_worker
 
 async def on_startup():
     """Инициализация при запуске"""
@@ -18,16 +23,13 @@ async def on_startup():
     await db.connect()
     logging.info("Database initialized")
 
-async def start_handler(message: Message):
-    db = Database()
-    actions = AdminActions()
-    
-    if await db.is_admin(message.from_user.id):
+async def start_handler(message: Message, is_admin: bool, is_moderator: bool):
+    if is_admin:
         await message.answer(
             text="👮‍♂️ Добро пожаловать в админ-панель",
             reply_markup=admin_main_kb()
         )
-    elif await db.is_moderator(message.from_user.id):
+    elif is_moderator:
         await message.answer(
             text="🛠 Вы вошли как модератор",
             reply_markup=moder_kb()
@@ -41,12 +43,16 @@ async def start_handler(message: Message):
 async def main():
     bot = Bot(token=Config.BOT_TOKEN)
     dp = Dispatcher()
+    setup_middlewares(dp)
 
     dp.message.register(start_handler, Command("start"))
     dp.include_router(admin_router)
     dp.include_router(user_router)
     dp.include_router(marzban_router)
     await on_startup()
+    node_monitor.start(bot)
+    stats_sampler.start()
+    broadcast_worker.start(bot)
     logging.info("Bot started")
     
     try:
@@ -56,6 +62,10 @@ async def main():
     except Exception as e:
         logging.error(f"Fatal error: {e}", exc_info=True)
     finally:
+        await node_monitor.stop()
+        await stats_sampler.stop()
+        await broadcast_worker.stop()
+        await MarzbanAPI.close()
         db = Database()
         await db._cleanup()
 
@@ -10,6 +10,37 @@ class Config:
     MARZBAN_PASSWORD = os.getenv("MARZBAN_PASSWORD")
     ADMIN_ID = os.getenv("ADMIN_ID")
 
+    # HTTP-клиент Marzban
+    MARZBAN_TIMEOUT = float(os.getenv("MARZBAN_TIMEOUT", "30"))
+    MARZBAN_POOL_LIMIT = int(os.getenv("MARZBAN_POOL_LIMIT", "100"))
+    MARZBAN_POOL_LIMIT_PER_HOST = int(os.getenv("MARZBAN_POOL_LIMIT_PER_HOST", "20"))
+    MARZBAN_KEEPALIVE = float(os.getenv("MARZBAN_KEEPALIVE", "30"))
+    # API панели не отдаёт изменений "с момента": зеркало перечитывается
+    # целиком, поэтому TTL большой, а свои изменения бот применяет сразу
+    MARZBAN_MIRROR_TTL = float(os.getenv("MARZBAN_MIRROR_TTL", "900"))
+    MARZBAN_BULK_CONCURRENCY = int(os.getenv("MARZBAN_BULK_CONCURRENCY", "10"))
+    MARZBAN_BULK_RATE = float(os.getenv("MARZBAN_BULK_RATE", "20"))
+    MARZBAN_NODES_INTERVAL = float(os.getenv("MARZBAN_NODES_INTERVAL", "60"))
+    MARZBAN_STATS_INTERVAL = float(os.getenv("MARZBAN_STATS_INTERVAL", "60"))
+    MARZBAN_STATS_RETENTION_DAYS = float(os.getenv("MARZBAN_STATS_RETENTION_DAYS", "7"))
+    MARZBAN_BREAKER_ERROR_RATE = float(os.getenv("MARZBAN_BREAKER_ERROR_RATE", "0.5"))
+    MARZBAN_BREAKER_SLOW_CALL = float(os.getenv("MARZBAN_BREAKER_SLOW_CALL", "5"))
+    MARZBAN_BREAKER_COOLDOWN = float(os.getenv("MARZBAN_BREAKER_COOLDOWN", "30"))
+
+    # SQLite: пул соединений на чтение и ожидание блокировки (мс)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+    DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))
+    # Групповая фиксация записей: размер пачки и окно сбора (сек)
+    DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "100"))
+    DB_BATCH_WINDOW = float(os.getenv("DB_BATCH_WINDOW", "0.005"))
+
+    # Рассылки: лимит Telegram (~30 сообщений/с) и число одновременных отправок
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "30"))
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+
+    # Минимальный интервал (сек) между правками сообщения с прогрессом
+    PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "3"))
+
     @classmethod
     def validate(cls):
         required = ["BOT_TOKEN", "MARZBAN_URL", "MARZBAN_USERNAME", "MARZBAN_PASSWORD", "ADMIN_ID"]
@@ -2,12 +2,397 @@ import aiosqlite
 import asyncio
 import logging
 import atexit
-from typing import Optional, List, Tuple, Dict, Any, AsyncGenerator
-from contextlib import asynccontextmanager
+from typing import Optional, List, Tuple, Dict, Any, AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
 from datetime import datetime
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Миграции схемы: (версия, описание, запросы). Применяются по порядку к
+# базам, у которых PRAGMA user_version меньше версии, каждая в своей
+# транзакции вместе с обновлением user_version. Шаги идемпотентны
+# (IF NOT EXISTS / IF EXISTS, AddColumn - только если столбца нет): базы,
+# созданные до появления миграций, проходят их с нуля без ошибок.
+@dataclass
+class AddColumn:
+    """Шаг миграции: ALTER TABLE ... ADD COLUMN, если столбца ещё нет"""
+    table: str
+    column: str
+    definition: str
+
+
+MIGRATIONS: List[Tuple[int, str, List[Any]]] = [
+    (1, "базовая схема", [
+        # Таблица пользователей
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            marzban_username TEXT PRIMARY KEY,
+            telegram_id INTEGER UNIQUE,
+            is_admin BOOLEAN DEFAULT FALSE,
+            is_moderator BOOLEAN DEFAULT FALSE,
+            is_banned BOOLEAN DEFAULT FALSE,
+            ban_reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Таблица заявок для админки
+        '''
+        CREATE TABLE IF NOT EXISTS admin_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            request_text TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            processed_at TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(telegram_id)
+        )''',
+        # История статистики сервера Marzban
+        '''
+        CREATE TABLE IF NOT EXISTS system_stats (
+            ts INTEGER PRIMARY KEY,
+            cpu REAL,
+            mem REAL,
+            online INTEGER,
+            active INTEGER
+        )''',
+        # Счётчики для статистики, их поддерживают триггеры на users.
+        # Начальные значения - один агрегирующий проход по таблице
+        '''
+        CREATE TABLE IF NOT EXISTS users_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            staff INTEGER NOT NULL,
+            banned INTEGER NOT NULL
+        )''',
+        '''
+        INSERT OR IGNORE INTO users_counters (id, total, staff, banned)
+        SELECT 1, COUNT(*),
+               COALESCE(SUM(is_admin OR is_moderator), 0),
+               COALESCE(SUM(is_banned), 0)
+        FROM users
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE users_counters
+            SET total = total + 1,
+                staff = staff + (NEW.is_admin OR NEW.is_moderator),
+                banned = banned + NEW.is_banned
+            WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE users_counters
+            SET total = total - 1,
+                staff = staff - (OLD.is_admin OR OLD.is_moderator),
+                banned = banned - OLD.is_banned
+            WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_update
+        AFTER UPDATE OF is_admin, is_moderator, is_banned ON users
+        BEGIN
+            UPDATE users_counters
+            SET staff = staff + (NEW.is_admin OR NEW.is_moderator) - (OLD.is_admin OR OLD.is_moderator),
+                banned = banned + NEW.is_banned - OLD.is_banned
+            WHERE id = 1;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_admin_requests_user_id ON admin_requests(user_id)',
+        # Листинг заявок по статусу с keyset-пагинацией по id
+        'CREATE INDEX IF NOT EXISTS idx_admin_requests_status_id ON admin_requests(status, id)',
+    ]),
+    (2, "частичные индексы для ролей и банов", [
+        # telegram_id уже проиндексирован ограничением UNIQUE
+        'DROP INDEX IF EXISTS idx_users_telegram_id',
+        # Малые доли таблицы: индексируются только строки с флагом
+        'CREATE INDEX IF NOT EXISTS idx_users_staff ON users(telegram_id) WHERE is_admin OR is_moderator',
+        'CREATE INDEX IF NOT EXISTS idx_users_banned ON users(telegram_id) WHERE is_banned',
+    ]),
+    (3, "задания рассылки", [
+        # cursor - telegram_id, до которого включительно все получатели обработаны
+        '''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_by INTEGER,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            cursor INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            deactivated INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            status_chat_id INTEGER,
+            status_message_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )''',
+        # Итог доставки по каждому получателю: защита от повторной отправки
+        '''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            error TEXT,
+            PRIMARY KEY (job_id, chat_id)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(status, id)',
+    ]),
+    (4, "исходное сообщение рассылки", [
+        # Сообщение админа, которое копируется получателям (text - превью)
+        AddColumn('broadcast_jobs', 'source_chat_id', 'INTEGER'),
+        AddColumn('broadcast_jobs', 'source_message_id', 'INTEGER'),
+    ]),
+    (5, "счётчик привязанных пользователей", [
+        # Общее число для списка пользователей в админке без COUNT(*) на страницу
+        AddColumn('users_counters', 'linked', 'INTEGER NOT NULL DEFAULT 0'),
+        'UPDATE users_counters SET linked = (SELECT COUNT(*) FROM users WHERE telegram_id IS NOT NULL) WHERE id = 1',
+        'DROP TRIGGER IF EXISTS trg_users_counters_insert',
+        '''
+        CREATE TRIGGER trg_users_counters_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE users_counters
+            SET total = total + 1,
+                staff = staff + (NEW.is_admin OR NEW.is_moderator),
+                banned = banned + NEW.is_banned,
+                linked = linked + (NEW.telegram_id IS NOT NULL)
+            WHERE id = 1;
+        END
+        ''',
+        'DROP TRIGGER IF EXISTS trg_users_counters_delete',
+        '''
+        CREATE TRIGGER trg_users_counters_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE users_counters
+            SET total = total - 1,
+                staff = staff - (OLD.is_admin OR OLD.is_moderator),
+                banned = banned - OLD.is_banned,
+                linked = linked - (OLD.telegram_id IS NOT NULL)
+            WHERE id = 1;
+        END
+        ''',
+        'DROP TRIGGER IF EXISTS trg_users_counters_update',
+        '''
+        CREATE TRIGGER trg_users_counters_update
+        AFTER UPDATE OF is_admin, is_moderator, is_banned, telegram_id ON users
+        BEGIN
+            UPDATE users_counters
+            SET staff = staff + (NEW.is_admin OR NEW.is_moderator) - (OLD.is_admin OR OLD.is_moderator),
+                banned = banned + NEW.is_banned - OLD.is_banned,
+                linked = linked + (NEW.telegram_id IS NOT NULL) - (OLD.telegram_id IS NOT NULL)
+            WHERE id = 1;
+        END
+        ''',
+    ]),
+]
+
+# Фильтры получателей рассылки по роли (как status в get_user)
+RECIPIENT_ROLES = {
+    'admin': 'is_admin',
+    'moder': 'is_moderator AND NOT is_admin',
+    'staff': '(is_admin OR is_moderator)',
+    'user': 'NOT is_admin AND NOT is_moderator',
+}
+
+BROADCAST_JOB_FIELDS = (
+    'id', 'created_by', 'text', 'status', 'cursor', 'total', 'sent', 'blocked',
+    'deactivated', 'failed', 'status_chat_id', 'status_message_id', 'created_at', 'finished_at',
+    'source_chat_id', 'source_message_id'
+)
+
+
+class ReaderPool:
+    """Пул соединений только для чтения.
+
+    В режиме WAL читатели не блокируют писателя и друг друга, поэтому
+    запросы из разных обработчиков выполняются параллельно, каждый в
+    своём потоке aiosqlite.
+    """
+
+    def __init__(self, db_path: str, size: int, busy_timeout: int):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self._conns: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def open(self) -> None:
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.db_path)
+            await conn.execute(f"PRAGMA busy_timeout={self.busy_timeout}")
+            await conn.execute("PRAGMA query_only=ON")
+            self._conns.append(conn)
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[aiosqlite.Connection, None]:
+        """Взять свободное соединение (ждёт, если все заняты)"""
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self) -> None:
+        for conn in self._conns:
+            await conn.close()
+        self._conns.clear()
+        self._idle = None
+
+
+@dataclass
+class _WriteJob:
+    """Одиночный запрос на запись, ожидающий групповой фиксации"""
+    query: str
+    params: tuple
+    future: asyncio.Future
+
+
+class Writer:
+    """Единственное соединение на запись с явной очередью.
+
+    В очереди два вида задач: транзакции (фоновая задача выдаёт соединение
+    одной транзакции и ждёт её завершения, поэтому чужие запросы не
+    попадают внутрь BEGIN ... COMMIT) и одиночные записи. Записи, идущие
+    подряд, собираются в пачку до batch_size штук или batch_window секунд
+    и фиксируются одним COMMIT (один fsync на пачку). Каждая запись
+    выполняется в своей точке сохранения, так что ошибка одной не
+    откатывает остальные, а вызывающий получает результат только после
+    COMMIT.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, batch_size: int = 100, batch_window: float = 0.005):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.batches = 0
+        self.batched_writes = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._held = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дождаться уже поставленных в очередь задач и остановиться"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def _next(self):
+        if self._held is not None:
+            item, self._held = self._held, None
+            return item
+        return await self._queue.get()
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._next()
+            if item is None:
+                return
+            if isinstance(item, _WriteJob):
+                await self._commit_batch(await self._collect(item))
+                continue
+            granted, released = item
+            if granted.cancelled():
+                continue
+            granted.set_result(self.conn)
+            await released.wait()
+
+    async def _collect(self, first: _WriteJob) -> List[_WriteJob]:
+        """Добрать в пачку записи, пришедшие в пределах окна"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                # Одиночную запись без конкурентов не задерживаем
+                timeout = deadline - loop.time()
+                if timeout <= 0 or len(batch) == 1:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if not isinstance(item, _WriteJob):
+                # Транзакция или остановка - после фиксации текущей пачки
+                self._held = item
+                break
+            batch.append(item)
+        return batch
+
+    async def _commit_batch(self, batch: List[_WriteJob]) -> None:
+        jobs = [job for job in batch if not job.future.cancelled()]
+        if not jobs:
+            return
+        conn = self.conn
+        results = []
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            for job in jobs:
+                await conn.execute("SAVEPOINT write_job")
+                try:
+                    results.append(await conn.execute(job.query, job.params))
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_job")
+                    results.append(e)
+                await conn.execute("RELEASE write_job")
+            await conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Batch commit failed ({len(jobs)} writes): {e}")
+            with suppress(Exception):
+                await conn.execute("ROLLBACK")
+            results = [e] * len(jobs)
+        else:
+            self.batches += 1
+            self.batched_writes += len(jobs)
+
+        for job, result in zip(jobs, results):
+            if job.future.done():
+                continue
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+    async def write(self, query: str, params: tuple = ()) -> aiosqlite.Cursor:
+        """Поставить запись в очередь и дождаться её фиксации"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_WriteJob(query, params, future))
+        return await future
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncGenerator[aiosqlite.Connection, None]:
+        granted = asyncio.get_running_loop().create_future()
+        released = asyncio.Event()
+        await self._queue.put((granted, released))
+        try:
+            conn = await granted
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.execute("ROLLBACK")
+                raise
+            await conn.execute("COMMIT")
+        finally:
+            released.set()
+
+
 class Database:
     _instance = None
     
@@ -16,19 +401,40 @@ class Database:
             cls._instance = super().__new__(cls)
             cls._instance.db_path = db_path
             cls._instance.conn = None
+            cls._instance.writer = None
+            cls._instance.readers = None
             cls._instance._cleanup_registered = False
             cls._instance._lock = asyncio.Lock()
+            # Кэш ролей: telegram_id -> (is_admin, is_moderator, is_banned).
+            # Хранятся только пользователи с ролью или баном, остальные - без прав
+            cls._instance._roles = {}
+            # Счётчики заявок по статусам, поддерживаются при записи
+            cls._instance._request_counts = {}
         return cls._instance
     
     async def connect(self) -> None:
         """Устанавливаем и инициализируем соединение с базой данных"""
+        if self.writer is not None:
+            return
         async with self._lock:
-            if self.conn is None:
+            if self.writer is None:
                 try:
-                    self.conn = await aiosqlite.connect(self.db_path)
-                    await self.conn.execute("PRAGMA journal_mode=WAL")
-                    await self.conn.execute("PRAGMA foreign_keys=ON")
-                    await self._ensure_tables()
+                    # Соединение писателя в autocommit: транзакции открывает Writer
+                    conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+                    await conn.execute("PRAGMA journal_mode=WAL")
+                    await conn.execute("PRAGMA foreign_keys=ON")
+                    # Иначе замена строки через INSERT OR REPLACE не вызывает DELETE-триггеры
+                    await conn.execute("PRAGMA recursive_triggers=ON")
+                    await conn.execute(f"PRAGMA busy_timeout={Config.DB_BUSY_TIMEOUT}")
+                    self.conn = conn
+                    await self._migrate()
+                    await self._load_roles()
+                    await self._load_request_counts()
+
+                    self.readers = ReaderPool(self.db_path, Config.DB_POOL_SIZE, Config.DB_BUSY_TIMEOUT)
+                    await self.readers.open()
+                    self.writer = Writer(conn, Config.DB_BATCH_SIZE, Config.DB_BATCH_WINDOW)
+                    self.writer.start()
                     
                     if not self._cleanup_registered:
                         atexit.register(self.sync_cleanup)
@@ -55,206 +461,344 @@ class Database:
         async with self._lock:
             if self.conn is not None:
                 try:
+                    if self.writer is not None:
+                        await self.writer.stop()
+                    if self.readers is not None:
+                        await self.readers.close()
                     await self.conn.close()
                     logger.info("Database connection closed gracefully")
                 except Exception as e:
                     logger.error(f"Error closing connection: {e}")
                 finally:
                     self.conn = None
+                    self.writer = None
+                    self.readers = None
 
-    async def _ensure_tables(self) -> None:
-        """Создаем необходимые таблицы при инициализации"""
+    async def _migrate(self) -> None:
+        """Применить недостающие миграции схемы (по PRAGMA user_version)"""
         try:
-            # Таблица пользователей
-            await self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                marzban_username TEXT PRIMARY KEY,
-                telegram_id INTEGER UNIQUE,
-                is_admin BOOLEAN DEFAULT FALSE,
-                is_moderator BOOLEAN DEFAULT FALSE,
-                is_banned BOOLEAN DEFAULT FALSE,
-                ban_reason TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''')
-
-            # Таблица заявок для админки
-            await self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS admin_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                request_text TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                processed_at TIMESTAMP,
-                FOREIGN KEY(user_id) REFERENCES users(telegram_id)
-            )''')
-
-            # Индексы для ускорения запросов
-            await self.conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)
-            ''')
-            
-            await self.conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_admin_requests_user_id ON admin_requests(user_id)
-            ''')
-
-            await self.conn.commit()
+            cursor = await self.conn.execute("PRAGMA user_version")
+            current = (await cursor.fetchone())[0]
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                await self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement in statements:
+                        if isinstance(statement, AddColumn):
+                            await self._add_column(statement)
+                        else:
+                            await self.conn.execute(statement)
+                    await self.conn.execute(f"PRAGMA user_version = {version}")
+                    await self.conn.execute("COMMIT")
+                except Exception:
+                    await self.conn.execute("ROLLBACK")
+                    raise
+                logger.info(f"Database migrated to v{version}: {description}")
             logger.info("Database tables initialized")
         except Exception as e:
-            logger.error(f"Table creation failed: {e}")
+            logger.error(f"Migration failed: {e}")
             raise
 
+    async def _add_column(self, step: AddColumn) -> None:
+        cursor = await self.conn.execute(f"PRAGMA table_info({step.table})")
+        if step.column not in {row[1] for row in await cursor.fetchall()}:
+            await self.conn.execute(
+                f"ALTER TABLE {step.table} ADD COLUMN {step.column} {step.definition}"
+            )
+
+    async def _load_roles(self) -> None:
+        """Загрузить роли и баны в память (выполняется при подключении)"""
+        cursor = await self.conn.execute(
+            '''
+            SELECT telegram_id, is_admin, is_moderator, is_banned
+            FROM users
+            WHERE (is_admin OR is_moderator) AND telegram_id IS NOT NULL
+            UNION
+            SELECT telegram_id, is_admin, is_moderator, is_banned
+            FROM users
+            WHERE is_banned AND telegram_id IS NOT NULL
+            '''
+        )
+        self._roles = {
+            row[0]: (bool(row[1]), bool(row[2]), bool(row[3]))
+            for row in await cursor.fetchall()
+        }
+        logger.info(f"Roles cache loaded: {len(self._roles)} entries")
+
+    async def _reload_roles(self, *telegram_ids: Optional[int]) -> None:
+        """Перечитать роли отдельных пользователей после изменения строк"""
+        for telegram_id in telegram_ids:
+            if telegram_id is None:
+                continue
+            row = await self.fetchone(
+                'SELECT is_admin, is_moderator, is_banned FROM users WHERE telegram_id = ?',
+                (telegram_id,)
+            )
+            self._set_roles(telegram_id, *(bool(v) for v in (row or (0, 0, 0))))
+
+    def _set_roles(self, telegram_id: int, is_admin: bool, is_moderator: bool, is_banned: bool) -> None:
+        if is_admin or is_moderator or is_banned:
+            self._roles[telegram_id] = (is_admin, is_moderator, is_banned)
+        else:
+            self._roles.pop(telegram_id, None)
+
+    async def get_roles(self, user_id: int) -> Tuple[bool, bool, bool]:
+        """Роли пользователя из кэша: (is_admin, is_moderator, is_banned)"""
+        await self.connect()
+        return self._roles.get(user_id, (False, False, False))
+
+    async def _load_request_counts(self) -> None:
+        """Загрузить количество заявок по статусам (выполняется при подключении)"""
+        cursor = await self.conn.execute(
+            'SELECT status, COUNT(*) FROM admin_requests GROUP BY status'
+        )
+        self._request_counts = {row[0]: row[1] for row in await cursor.fetchall()}
+
+    def _count_request(self, status: Optional[str], delta: int) -> None:
+        if status is None:
+            return
+        count = self._request_counts.get(status, 0) + delta
+        if count > 0:
+            self._request_counts[status] = count
+        else:
+            self._request_counts.pop(status, None)
+
+    async def get_request_counts(self) -> Dict[str, int]:
+        """Количество заявок по статусам (из кэша, без запроса к SQLite)"""
+        await self.connect()
+        return dict(self._request_counts)
+
     @asynccontextmanager
-    async def transaction(self) -> AsyncGenerator[None, None]:
-        """Контекстный менеджер для транзакций"""
+    async def transaction(self) -> AsyncGenerator[aiosqlite.Connection, None]:
+        """Транзакция на соединении писателя (в очереди Writer).
+
+        Запросы внутри выполняются через выданное соединение conn; вложенные
+        вызовы transaction() и execute() приведут к взаимоблокировке.
+        """
         await self.connect()
         try:
-            await self.conn.execute("BEGIN")
-            yield
-            await self.conn.commit()
+            async with self.writer.transaction() as conn:
+                yield conn
         except Exception as e:
-            await self.conn.rollback()
             logger.error(f"Transaction failed: {e}")
             raise
 
-    async def execute(self, query: str, params: tuple = (), retry: bool = True) -> aiosqlite.Cursor:
-        """Безопасное выполнение SQL-запроса"""
+    async def execute(self, query: str, params: tuple = ()) -> aiosqlite.Cursor:
+        """Выполнить одиночный запрос на запись.
+
+        Запрос попадает в очередь Writer и фиксируется вместе с соседними
+        записями одним COMMIT; возвращается после фиксации.
+        """
+        await self.connect()
+        try:
+            return await self.writer.write(query, params)
+        except Exception as e:
+            logger.error(f"Query failed: {query[:100]}... Error: {e}")
+            raise
+
+    async def _read(self, query: str, params: tuple, one: bool, retry: bool = True):
         try:
             await self.connect()
-            return await self.conn.execute(query, params)
+            async with self.readers.acquire() as conn:
+                cursor = await conn.execute(query, params)
+                return await (cursor.fetchone() if one else cursor.fetchall())
         except Exception as e:
             if retry:
                 logger.warning(f"Retrying query: {query[:100]}...")
                 await asyncio.sleep(0.1)
-                return await self.execute(query, params, retry=False)
+                return await self._read(query, params, one, retry=False)
             logger.error(f"Query failed: {query[:100]}... Error: {e}")
             raise
 
+    async def fetchone(self, query: str, params: tuple = ()) -> Optional[tuple]:
+        """Прочитать одну строку через пул читателей"""
+        return await self._read(query, params, one=True)
+
+    async def fetchall(self, query: str, params: tuple = ()) -> List[tuple]:
+        """Прочитать все строки через пул читателей"""
+        return await self._read(query, params, one=False)
+
     # Основные методы API
     async def get_telegram_id(self, marzban_username: str) -> Optional[int]:
         """Получить Telegram ID по имени пользователя Marzban"""
-        cursor = await self.execute(
+        result = await self.fetchone(
             'SELECT telegram_id FROM users WHERE marzban_username = ?',
             (marzban_username,)
         )
-        result = await cursor.fetchone()
         return result[0] if result else None
 
     async def get_marzban_username(self, telegram_id: int) -> Optional[str]:
         """Получить имя пользователя Marzban по Telegram ID"""
-        cursor = await self.execute(
+        result = await self.fetchone(
             'SELECT marzban_username FROM users WHERE telegram_id = ?',
             (telegram_id,)
         )
-        result = await cursor.fetchone()
         return result[0] if result else None
 
     async def update_telegram_id(self, marzban_username: str, telegram_id: int) -> None:
         """Обновить или добавить связку Marzban-Telegram"""
-        async with self.transaction():
-            await self.execute(
-                '''
-                INSERT OR REPLACE INTO users (marzban_username, telegram_id)
-                VALUES (?, ?)
-                ''',
-                (marzban_username, telegram_id)
-            )
+        previous_id = await self.get_telegram_id(marzban_username)
+        await self.execute(
+            '''
+            INSERT OR REPLACE INTO users (marzban_username, telegram_id)
+            VALUES (?, ?)
+            ''',
+            (marzban_username, telegram_id)
+        )
+        # REPLACE пересоздает строку со сброшенными флагами
+        await self._reload_roles(previous_id, telegram_id)
 
     # Методы для админ-панели
     async def is_admin(self, user_id: int) -> bool:
         """Проверить, является ли пользователь администратором"""
-        cursor = await self.execute(
-            'SELECT is_admin FROM users WHERE telegram_id = ?',
-            (user_id,)
-        )
-        result = await cursor.fetchone()
-        return bool(result and result[0])
+        return (await self.get_roles(user_id))[0]
 
     async def is_moderator(self, user_id: int) -> bool:
         """Проверить, является ли пользователь модератором"""
-        cursor = await self.execute(
-            'SELECT is_moderator FROM users WHERE telegram_id = ?',
-            (user_id,)
-        )
-        result = await cursor.fetchone()
-        return bool(result and result[0])
+        return (await self.get_roles(user_id))[1]
 
     async def is_banned(self, user_id: int) -> bool:
         """Проверить, забанен ли пользователь"""
-        cursor = await self.execute(
-            'SELECT is_banned FROM users WHERE telegram_id = ?',
-            (user_id,)
-        )
-        result = await cursor.fetchone()
-        return bool(result and result[0])
+        return (await self.get_roles(user_id))[2]
 
     async def set_admin(self, user_id: int, is_admin: bool = True) -> None:
         """Назначить/снять администратора"""
-        async with self.transaction():
-            await self.execute(
-                'UPDATE users SET is_admin = ? WHERE telegram_id = ?',
-                (is_admin, user_id)
-            )
+        cursor = await self.execute(
+            'UPDATE users SET is_admin = ? WHERE telegram_id = ?',
+            (is_admin, user_id)
+        )
+        if cursor.rowcount:
+            _, is_moderator, is_banned = await self.get_roles(user_id)
+            self._set_roles(user_id, bool(is_admin), is_moderator, is_banned)
 
     async def set_moderator(self, user_id: int, is_moderator: bool = True) -> None:
         """Назначить/снять модератора"""
-        async with self.transaction():
-            await self.execute(
-                'UPDATE users SET is_moderator = ? WHERE telegram_id = ?',
-                (is_moderator, user_id)
-            )
+        cursor = await self.execute(
+            'UPDATE users SET is_moderator = ? WHERE telegram_id = ?',
+            (is_moderator, user_id)
+        )
+        if cursor.rowcount:
+            is_admin, _, is_banned = await self.get_roles(user_id)
+            self._set_roles(user_id, is_admin, bool(is_moderator), is_banned)
 
     async def ban_user(self, user_id: int, reason: str = None) -> None:
         """Забанить пользователя"""
-        async with self.transaction():
-            await self.execute(
-                'UPDATE users SET is_banned = TRUE, ban_reason = ? WHERE telegram_id = ?',
-                (reason, user_id)
-            )
+        cursor = await self.execute(
+            'UPDATE users SET is_banned = TRUE, ban_reason = ? WHERE telegram_id = ?',
+            (reason, user_id)
+        )
+        if cursor.rowcount:
+            is_admin, is_moderator, _ = await self.get_roles(user_id)
+            self._set_roles(user_id, is_admin, is_moderator, True)
 
     async def unban_user(self, user_id: int) -> None:
         """Разбанить пользователя"""
-        async with self.transaction():
-            await self.execute(
-                'UPDATE users SET is_banned = FALSE, ban_reason = NULL WHERE telegram_id = ?',
-                (user_id,)
-            )
+        cursor = await self.execute(
+            'UPDATE users SET is_banned = FALSE, ban_reason = NULL WHERE telegram_id = ?',
+            (user_id,)
+        )
+        if cursor.rowcount:
+            is_admin, is_moderator, _ = await self.get_roles(user_id)
+            self._set_roles(user_id, is_admin, is_moderator, False)
+
+    async def get_admin_ids(self) -> List[int]:
+        """Получить Telegram ID всех администраторов"""
+        await self.connect()
+        return [user_id for user_id, roles in self._roles.items() if roles[0]]
 
     async def get_all_users(self) -> List[Tuple[str, int]]:
         """Получить список всех пользователей"""
-        cursor = await self.execute(
+        return await self.fetchall(
             'SELECT marzban_username, telegram_id FROM users'
         )
-        return await cursor.fetchall()
+
+    async def get_users_page(
+        self,
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """Страница привязанных пользователей (keyset по marzban_username).
+
+        after - вперёд от последнего username предыдущей страницы,
+        before - назад от первого username текущей. Роль, бан и общее
+        количество (счётчик linked из users_counters, без COUNT(*)) приходят
+        одним запросом; лишняя строка (limit + 1) показывает, есть ли
+        страница дальше.
+        """
+        if before is not None:
+            where, params, order = 'AND marzban_username < ?', (before,), 'DESC'
+        elif after is not None:
+            where, params, order = 'AND marzban_username > ?', (after,), 'ASC'
+        else:
+            where, params, order = '', (), 'ASC'
+
+        rows = await self.fetchall(
+            f'''
+            SELECT
+                telegram_id,
+                marzban_username,
+                CASE
+                    WHEN is_admin THEN 'admin'
+                    WHEN is_moderator THEN 'moder'
+                    ELSE 'user'
+                END as status,
+                is_banned,
+                (SELECT linked FROM users_counters WHERE id = 1) as total
+            FROM users
+            WHERE telegram_id IS NOT NULL {where}
+            ORDER BY marzban_username {order}
+            LIMIT ?
+            ''',
+            params + (limit + 1,)
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+
+        return {
+            'users': [{
+                'id': row[0],
+                'username': row[1],
+                'status': row[2],
+                'is_banned': bool(row[3])
+            } for row in rows],
+            'total': rows[0][4] if rows else 0,
+            'has_prev': more if before is not None else after is not None,
+            'has_next': before is not None or more
+        }
 
     async def get_active_users(self) -> List[Dict[str, Any]]:
         """Получить список активных пользователей"""
-        cursor = await self.execute(
+        rows = await self.fetchall(
             '''
             SELECT telegram_id, marzban_username
             FROM users
             WHERE is_banned = FALSE
             '''
         )
-        return [{'telegram_id': row[0], 'username': row[1]} for row in await cursor.fetchall()]
+        return [{'telegram_id': row[0], 'username': row[1]} for row in rows]
 
     async def get_active_users_count(self) -> int:
         """Получить количество активных пользователей"""
-        cursor = await self.execute(
-            'SELECT COUNT(*) FROM users WHERE is_banned = FALSE'
+        row = await self.fetchone(
+            'SELECT total - banned FROM users_counters WHERE id = 1'
         )
-        return (await cursor.fetchone())[0]
+        return row[0] if row else 0
 
     async def is_tgid_exists(self, telegram_id: int) -> bool:
         """Проверить существование Telegram ID"""
-        cursor = await self.execute(
+        row = await self.fetchone(
             'SELECT 1 FROM users WHERE telegram_id = ?',
             (telegram_id,)
         )
-        return await cursor.fetchone() is not None
+        return row is not None
 
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получить информацию о пользователе"""
-        cursor = await self.execute(
+        result = await self.fetchone(
             '''
             SELECT 
                 telegram_id,
@@ -272,7 +816,6 @@ class Database:
             ''',
             (user_id,)
         )
-        result = await cursor.fetchone()
         if not result:
             return None
         
@@ -289,7 +832,7 @@ class Database:
     async def get_requests(self, status: str = None) -> List[Dict[str, Any]]:
         """Получить список заявок"""
         if status:
-            cursor = await self.execute(
+            rows = await self.fetchall(
                 '''
                 SELECT ar.id, ar.user_id, ar.request_text, ar.status, ar.processed_at,
                        u.marzban_username as username
@@ -301,7 +844,7 @@ class Database:
                 (status,)
             )
         else:
-            cursor = await self.execute(
+            rows = await self.fetchall(
                 '''
                 SELECT ar.id, ar.user_id, ar.request_text, ar.status, ar.processed_at,
                        u.marzban_username as username
@@ -320,12 +863,76 @@ class Database:
                 'processed_at': row[4],
                 'username': row[5]
             }
-            for row in await cursor.fetchall()
+            for row in rows
         ]
 
+    async def get_requests_page(
+        self,
+        status: str = None,
+        before_id: int = None,
+        after_id: int = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """Страница заявок, новые сверху (keyset по id DESC).
+
+        before_id - следующая страница (заявки старше последней показанной),
+        after_id - предыдущая (новее первой показанной). Запрос идёт по
+        индексу (status, id) и не зависит от размера истории.
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append('ar.status = ?')
+            params.append(status)
+        if after_id is not None:
+            conditions.append('ar.id > ?')
+            params.append(after_id)
+            order = 'ASC'
+        else:
+            if before_id is not None:
+                conditions.append('ar.id < ?')
+                params.append(before_id)
+            order = 'DESC'
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        rows = await self.fetchall(
+            f'''
+            SELECT ar.id, ar.user_id, ar.request_text, ar.status, ar.processed_at,
+                   u.marzban_username as username
+            FROM admin_requests ar
+            LEFT JOIN users u ON ar.user_id = u.telegram_id
+            {where}
+            ORDER BY ar.id {order}
+            LIMIT ?
+            ''',
+            tuple(params) + (limit + 1,)
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if after_id is not None:
+            rows.reverse()
+
+        counts = self._request_counts
+        return {
+            'requests': [
+                {
+                    'id': row[0],
+                    'user_id': row[1],
+                    'text': row[2],
+                    'status': row[3],
+                    'processed_at': row[4],
+                    'username': row[5]
+                }
+                for row in rows
+            ],
+            'status': status,
+            'total': counts.get(status, 0) if status else sum(counts.values()),
+            'has_prev': more if after_id is not None else before_id is not None,
+            'has_next': after_id is not None or more
+        }
+
     async def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
         """Получить детали конкретной заявки"""
-        cursor = await self.execute(
+        result = await self.fetchone(
             '''
             SELECT ar.id, ar.user_id, ar.request_text, ar.status, ar.processed_at,
                    u.marzban_username as username
@@ -335,7 +942,6 @@ class Database:
             ''',
             (request_id,)
         )
-        result = await cursor.fetchone()
         if not result:
             return None
         
@@ -350,67 +956,227 @@ class Database:
 
     async def create_request(self, user_id: int, request_text: str) -> int:
         """Создать новую заявку"""
-        async with self.transaction():
-            cursor = await self.execute(
-                '''
-                INSERT INTO admin_requests (user_id, request_text)
-                VALUES (?, ?)
-                ''',
-                (user_id, request_text)
-            )
-            return cursor.lastrowid
+        cursor = await self.execute(
+            '''
+            INSERT INTO admin_requests (user_id, request_text)
+            VALUES (?, ?)
+            ''',
+            (user_id, request_text)
+        )
+        self._count_request('pending', 1)
+        return cursor.lastrowid
 
-    async def approve_request(self, request_id: int) -> None:
-        """Одобрить заявку"""
-        async with self.transaction():
-            await self.execute(
+    async def _set_request_status(self, request_id: int, status: str) -> None:
+        """Сменить статус заявки и поправить счётчики"""
+        async with self.transaction() as conn:
+            cursor = await conn.execute(
+                'SELECT status FROM admin_requests WHERE id = ?',
+                (request_id,)
+            )
+            row = await cursor.fetchone()
+            await conn.execute(
                 '''
                 UPDATE admin_requests 
-                SET status = 'approved', processed_at = CURRENT_TIMESTAMP
+                SET status = ?, processed_at = CURRENT_TIMESTAMP
                 WHERE id = ?
                 ''',
-                (request_id,)
+                (status, request_id)
             )
+        if row and row[0] != status:
+            self._count_request(row[0], -1)
+            self._count_request(status, 1)
+
+    async def approve_request(self, request_id: int) -> None:
+        """Одобрить заявку"""
+        await self._set_request_status(request_id, 'approved')
 
     async def reject_request(self, request_id: int) -> None:
         """Отклонить заявку"""
-        async with self.transaction():
-            await self.execute(
-                '''
-                UPDATE admin_requests 
-                SET status = 'rejected', processed_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                ''',
-                (request_id,)
-            )
+        await self._set_request_status(request_id, 'rejected')
 
     async def get_stats(self) -> Dict[str, Any]:
-        """Получить статистику бота"""
-        async with self.transaction():
-            cursor = await self.execute('SELECT COUNT(*) FROM users')
-            total_users = (await cursor.fetchone())[0]
-            
-            cursor = await self.execute(
-                'SELECT COUNT(*) FROM users WHERE is_admin = 1 OR is_moderator = 1'
-            )
-            active_staff = (await cursor.fetchone())[0]
-            
-            cursor = await self.execute(
-                'SELECT COUNT(*) FROM admin_requests WHERE status = "pending"'
-            )
-            pending_requests = (await cursor.fetchone())[0]
-            
-            cursor = await self.execute(
-                'SELECT COUNT(*) FROM users WHERE is_banned = 1'
+        """Получить статистику бота.
+
+        Счётчики пользователей ведут триггеры (users_counters), заявок -
+        кэш в памяти, так что это чтение одной строки без сканирования
+        таблиц и без транзакции на запись.
+        """
+        row = await self.fetchone(
+            'SELECT total, staff, banned FROM users_counters WHERE id = 1'
+        )
+        total_users, active_staff, banned_users = row or (0, 0, 0)
+        return {
+            'total_users': total_users,
+            'active_staff': active_staff,
+            'pending_requests': self._request_counts.get('pending', 0),
+            'banned_users': banned_users
+        }
+
+    # Методы для истории статистики сервера
+    async def add_system_sample(self, ts: int, cpu: float, mem: float, online: int, active: int) -> None:
+        """Сохранить замер статистики сервера"""
+        await self.execute(
+            'INSERT OR REPLACE INTO system_stats (ts, cpu, mem, online, active) VALUES (?, ?, ?, ?, ?)',
+            (ts, cpu, mem, online, active)
+        )
+
+    async def get_system_samples(self, since: float) -> List[Tuple[int, float, float, int, int]]:
+        """Получить замеры статистики начиная с момента since"""
+        return await self.fetchall(
+            'SELECT ts, cpu, mem, online, active FROM system_stats WHERE ts >= ? ORDER BY ts',
+            (int(since),)
+        )
+
+    async def prune_system_samples(self, before: float) -> None:
+        """Удалить замеры старше before"""
+        await self.execute(
+            'DELETE FROM system_stats WHERE ts < ?',
+            (int(before),)
+        )
+
+    # Методы для заданий рассылки
+    async def iter_recipients(
+        self,
+        after: int = 0,
+        chunk: int = 500,
+        role: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None
+    ) -> AsyncIterator[List[int]]:
+        """Незабаненные получатели пачками до chunk telegram_id, по возрастанию.
+
+        Каждая пачка - отдельный keyset-запрос (telegram_id > последнего
+        выданного), поэтому память не зависит от размера базы, а забаненные
+        после начала обхода в следующие пачки не попадают. role - admin,
+        moder, staff или user; created_from/created_to - границы created_at.
+        """
+        conditions = ['telegram_id > ?', 'NOT is_banned']
+        filters: List[Any] = []
+        if role:
+            conditions.append(RECIPIENT_ROLES[role])
+        if created_from:
+            conditions.append('created_at >= ?')
+            filters.append(created_from)
+        if created_to:
+            conditions.append('created_at < ?')
+            filters.append(created_to)
+        query = (
+            f"SELECT telegram_id FROM users WHERE {' AND '.join(conditions)} "
+            "ORDER BY telegram_id LIMIT ?"
+        )
+
+        while True:
+            rows = await self.fetchall(query, (after, *filters, chunk))
+            if not rows:
+                return
+            ids = [row[0] for row in rows]
+            yield ids
+            if len(ids) < chunk:
+                return
+            after = ids[-1]
+
+    async def create_broadcast_job(
+        self,
+        created_by: int,
+        text: str,
+        status_chat_id: Optional[int] = None,
+        status_message_id: Optional[int] = None,
+        source_chat_id: Optional[int] = None,
+        source_message_id: Optional[int] = None
+    ) -> int:
+        """Создать задание рассылки (получатели - незабаненные на момент отправки).
+
+        Если задано исходное сообщение, получателям копируется оно, а text
+        служит только превью; иначе рассылается text.
+        """
+        cursor = await self.execute(
+            '''
+            INSERT INTO broadcast_jobs (
+                created_by, text, total, status_chat_id, status_message_id,
+                source_chat_id, source_message_id
             )
-            banned_users = (await cursor.fetchone())[0]
-            
-            return {
-                'total_users': total_users,
-                'active_staff': active_staff,
-                'pending_requests': pending_requests,
-                'banned_users': banned_users
-            }
+            VALUES (?, ?, (SELECT total - banned FROM users_counters WHERE id = 1), ?, ?, ?, ?)
+            ''',
+            (created_by, text, status_chat_id, status_message_id, source_chat_id, source_message_id)
+        )
+        return cursor.lastrowid
+
+    async def get_broadcast_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Получить задание рассылки"""
+        row = await self.fetchone(
+            f"SELECT {', '.join(BROADCAST_JOB_FIELDS)} FROM broadcast_jobs WHERE id = ?",
+            (job_id,)
+        )
+        return dict(zip(BROADCAST_JOB_FIELDS, row)) if row else None
+
+    async def get_broadcast_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Последние задания рассылки, новые сверху"""
+        rows = await self.fetchall(
+            f"SELECT {', '.join(BROADCAST_JOB_FIELDS)} FROM broadcast_jobs ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return [dict(zip(BROADCAST_JOB_FIELDS, row)) for row in rows]
+
+    async def next_broadcast_job(self) -> Optional[Dict[str, Any]]:
+        """Следующее задание к выполнению: прерванное (running) или ожидающее"""
+        row = await self.fetchone(
+            f'''
+            SELECT {', '.join(BROADCAST_JOB_FIELDS)} FROM broadcast_jobs
+            WHERE status IN ('running', 'pending')
+            ORDER BY status = 'running' DESC, id
+            LIMIT 1
+            '''
+        )
+        return dict(zip(BROADCAST_JOB_FIELDS, row)) if row else None
+
+    async def set_broadcast_status(self, job_id: int, status: str, only_from: Tuple[str, ...] = ()) -> bool:
+        """Сменить статус задания (only_from - допустимые текущие статусы)"""
+        query = 'UPDATE broadcast_jobs SET status = ?'
+        params: Tuple[Any, ...] = (status,)
+        if status in ('done', 'cancelled'):
+            query += ', finished_at = CURRENT_TIMESTAMP'
+        query += ' WHERE id = ?'
+        params += (job_id,)
+        if only_from:
+            query += f" AND status IN ({', '.join('?' * len(only_from))})"
+            params += only_from
+        cursor = await self.execute(query, params)
+        return cursor.rowcount > 0
+
+    async def checkpoint_broadcast(self, job_id: int, cursor: int, counts: Dict[str, int]) -> None:
+        """Сохранить позицию и счётчики задания"""
+        await self.execute(
+            '''
+            UPDATE broadcast_jobs
+            SET cursor = MAX(cursor, ?), sent = ?, blocked = ?, deactivated = ?, failed = ?
+            WHERE id = ?
+            ''',
+            (cursor, counts.get('sent', 0), counts.get('blocked', 0),
+             counts.get('deactivated', 0), counts.get('failed', 0), job_id)
+        )
+
+    async def add_broadcast_delivery(self, job_id: int, chat_id: int, state: str, error: str = None) -> None:
+        """Записать итог доставки получателю"""
+        await self.execute(
+            'INSERT OR REPLACE INTO broadcast_deliveries (job_id, chat_id, state, error) VALUES (?, ?, ?, ?)',
+            (job_id, chat_id, state, error)
+        )
+
+    async def get_broadcast_delivered(self, job_id: int, low: int, high: int) -> set:
+        """telegram_id из диапазона [low, high], которым задание уже доставлялось"""
+        rows = await self.fetchall(
+            'SELECT chat_id FROM broadcast_deliveries WHERE job_id = ? AND chat_id BETWEEN ? AND ?',
+            (job_id, low, high)
+        )
+        return {row[0] for row in rows}
+
+    async def get_broadcast_counts(self, job_id: int) -> Dict[str, int]:
+        """Итоги доставки задания по категориям"""
+        rows = await self.fetchall(
+            'SELECT state, COUNT(*) FROM broadcast_deliveries WHERE job_id = ? GROUP BY state',
+            (job_id,)
+        )
+        return {row[0]: row[1] for row in rows}
 
 # Функции для обратной совместимости
 async def init_db() -> None:
@@ -1,6 +1,8 @@
-import requests
-from requests.auth import HTTPBasicAuth
-from typing import Optional, Dict, Any, List
+import asyncio
+import time
+import aiohttp
+from collections import deque
+from typing import Optional, Dict, Any, List, AsyncIterator, Deque, Callable, Tuple
 import sys
 from pathlib import Path
 import logging
@@ -15,78 +17,212 @@ logger = logging.getLogger(__name__)
 # Добавляем родительскую директорию в путь
 sys.path.append(str(Path(__file__).parent.parent))
 from config import Config
+from marzban.auth import TokenManager
+from marzban.breaker import CircuitBreaker, CircuitOpenError, LastKnownGood
+from marzban.metrics import client_metrics, endpoint_template
+from marzban.models import User, SystemStats, Node, json_loads
+from marzban.singleflight import SingleFlight
+
+
+class MarzbanAPIError(Exception):
+    """Ошибка HTTP-ответа панели Marzban"""
+
+    def __init__(self, status: int, text: str):
+        self.status = status
+        self.text = text
+        super().__init__(f"HTTP Error {status}: {text}")
+
+
+def is_transient(error: Exception) -> bool:
+    """Сбой панели, а не ответ на неверный запрос: сеть, 429, 5xx, битый ответ.
+
+    Такие ошибки имеет смысл повторить, они же считаются отказами в
+    предохранителе и разрешают отдать последние известные данные.
+    """
+    if isinstance(error, MarzbanAPIError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError, ValueError))
+
 
 class MarzbanAPI:
-    def __init__(self):
-        """Инициализация API клиента"""
+    # Общая на весь процесс HTTP-сессия с пулом keep-alive соединений
+    _session: Optional[aiohttp.ClientSession] = None
+    _tokens: Optional[TokenManager] = None
+    # Объединение одинаковых параллельных GET-запросов
+    _reads = SingleFlight()
+    # Предохранитель и последние успешные ответы по пользователям
+    breaker = CircuitBreaker(
+        error_rate=Config.MARZBAN_BREAKER_ERROR_RATE,
+        slow_call=Config.MARZBAN_BREAKER_SLOW_CALL,
+        cooldown=Config.MARZBAN_BREAKER_COOLDOWN
+    )
+    _last_users: LastKnownGood[User] = LastKnownGood()
+    # Подписчики на изменения пользователей, сделанные самим ботом
+    _user_listeners: List[Callable[[str, Optional[User]], None]] = []
+
+    def __init__(self, timeout: Optional[float] = None):
+        """Инициализация API клиента (без сетевых запросов)"""
         self.base_url = Config.MARZBAN_URL.rstrip('/')
-        self.username = Config.MARZBAN_USERNAME
-        self.password = Config.MARZBAN_PASSWORD
-        self.token = None
-        self._get_token()
-        logger.info(f"MarzbanAPI initialized for {self.base_url}")
-
-    def _get_token(self) -> None:
-        """Получение и обновление токена авторизации"""
-        endpoint = f"{self.base_url}/api/admin/token"
-        auth = HTTPBasicAuth(self.username, self.password)
-        data = {
-            "grant_type": "password",
-            "username": self.username,
-            "password": self.password
-        }
-        
-        try:
-            logger.debug(f"Requesting token from {endpoint}")
-            response = requests.post(endpoint, data=data, auth=auth)
-            response.raise_for_status()
-            
-            self.token = response.json().get("access_token")
-            if not self.token:
-                raise ValueError("Empty access token received")
-            
-            logger.info("Successfully obtained access token")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Token request failed: {str(e)}")
-            raise ConnectionError(f"Could not connect to Marzban API: {str(e)}")
+        self.timeout = timeout if timeout is not None else Config.MARZBAN_TIMEOUT
 
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        """Общая сессия с пулом соединений (создается лениво)"""
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=Config.MARZBAN_POOL_LIMIT,
+                limit_per_host=Config.MARZBAN_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=Config.MARZBAN_KEEPALIVE
+            )
+            cls._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=Config.MARZBAN_TIMEOUT)
+            )
+            logger.info("Marzban HTTP session created")
+        return cls._session
+
+    @classmethod
+    async def close(cls) -> None:
+        """Закрытие общей сессии (при остановке бота)"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+            logger.info("Marzban HTTP session closed")
+        cls._session = None
+
+    @classmethod
+    def get_token_manager(cls) -> TokenManager:
+        """Общий менеджер токена (один логин на весь процесс)"""
+        if cls._tokens is None:
+            cls._tokens = TokenManager(
+                Config.MARZBAN_URL,
+                Config.MARZBAN_USERNAME,
+                Config.MARZBAN_PASSWORD
+            )
+        return cls._tokens
+
+    @classmethod
+    def add_user_listener(cls, callback: Callable[[str, Optional[User]], None]) -> None:
+        """Подписка на изменения пользователей: callback(username, data).
+
+        data - ответ панели после изменения или None, если пользователь удален.
+        """
+        cls._user_listeners.append(callback)
+
+    def _notify_user_changed(self, username: str, data: Optional[User]) -> None:
+        if data is not None:
+            self._last_users.put(username, data)
+        else:
+            self._last_users.discard(username)
+        for callback in self._user_listeners:
+            try:
+                callback(username, data)
+            except Exception as e:
+                logger.error(f"User listener failed: {str(e)}")
+
+    @classmethod
+    def coalescing_stats(cls) -> Dict[str, int]:
+        """Счетчики объединения запросов: hits - присоединились к идущему"""
+        return cls._reads.stats()
+
+    async def get_token(self) -> str:
+        """Получение актуального токена авторизации"""
+        return await self.get_token_manager().get_token(self.get_session(), self.timeout)
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
         """Базовый метод для выполнения запросов с обработкой ошибок"""
-        if not self.token:
-            self._get_token()
-            
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
-        
+        if method == "GET":
+            # Одинаковые параллельные чтения делят один HTTP-запрос
+            params = kwargs.get("params") or {}
+            key = (endpoint, tuple(sorted(params.items())))
+            return await self._reads.do(
+                key,
+                lambda: self._send(method, endpoint, timeout, **kwargs)
+            )
+        return await self._send(method, endpoint, timeout, **kwargs)
+
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """Запрос через предохранитель: при недоступной панели - сразу ошибка"""
+        probe = self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = await self._send_with_reauth(method, endpoint, timeout, **kwargs)
+        except Exception as e:
+            self.breaker.record(not is_transient(e), time.perf_counter() - started, probe)
+            raise
+        except BaseException:
+            # Отмена: итога нет, но проба half-open не должна зависнуть
+            self.breaker.abandon(probe)
+            raise
+        self.breaker.record(True, time.perf_counter() - started, probe)
+        return result
+
+    async def _send_with_reauth(
+        self,
+        method: str,
+        endpoint: str,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """Выполнение HTTP-запроса с повторной авторизацией после 401"""
         url = f"{self.base_url}{endpoint}"
-        logger.debug(f"Making {method} request to {url}")
+        template = endpoint_template(method, endpoint)
+        debug = logger.isEnabledFor(logging.DEBUG)
         
-        try:
-            response = requests.request(
-                method, 
-                url, 
-                headers=headers, 
-                timeout=30,
-                **kwargs
-            )
-            
-            logger.debug(f"Response status: {response.status_code}")
-            logger.debug(f"Response content: {response.text[:200]}...")
+        # Вторая попытка - только после 401 и повторной авторизации
+        for attempt in range(2):
+            token = await self.get_token()
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            if debug:
+                logger.debug(f"Making {method} request to {url}")
             
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"HTTP Error {e.response.status_code}: {e.response.text}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {str(e)}")
-            raise ConnectionError(f"API request failed: {str(e)}")
-
-    def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                async with self.get_session().request(
+                    method,
+                    url,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                    **kwargs
+                ) as response:
+                    body = await response.read()
+                    client_metrics.observe(template, time.perf_counter() - started, response.status)
+                    
+                    if debug:
+                        logger.debug(f"Response status: {response.status}")
+                        logger.debug(f"Response content: {body[:200]!r}...")
+                    
+                    if response.status == 401 and attempt == 0:
+                        logger.info("Token rejected, re-authenticating")
+                        client_metrics.observe_retry(template)
+                        self.get_token_manager().invalidate(token)
+                        continue
+                    if response.status >= 400:
+                        error = MarzbanAPIError(response.status, body.decode(errors="replace"))
+                        logger.error(str(error))
+                        raise error
+                    return json_loads(body) if body else {}
+                
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                client_metrics.observe_exception(template, time.perf_counter() - started, e)
+                logger.error(f"Request failed: {str(e)}")
+                raise ConnectionError(f"API request failed: {str(e)}")
+
+    async def create_user(self, user_data: Dict[str, Any]) -> User:
         """Создание нового пользователя с обязательными параметрами"""
         endpoint = "/api/user"
         
@@ -118,71 +254,161 @@ class MarzbanAPI:
         if "username" not in payload:
             raise ValueError("Username is required")
         
-        return self._make_request("POST", endpoint, json=payload)
+        result = User.from_dict(await self._make_request("POST", endpoint, json=payload))
+        self._notify_user_changed(payload["username"], result)
+        return result
 
-    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+    async def get_user(self, username: str) -> Optional[User]:
         """Получение информации о пользователе"""
+        data = await self.get_user_details(username)
+        if not data:
+            self._last_users.discard(username)
+            return None
+        user = User.from_dict(data)
+        self._last_users.put(username, user)
+        return user
+
+    @classmethod
+    def last_known_user(cls, username: str) -> Optional[Tuple[float, User]]:
+        """Последние успешно полученные данные пользователя: (время, User)"""
+        return cls._last_users.get(username)
+
+    async def get_user_details(self, username: str) -> Optional[Dict[str, Any]]:
+        """Полный ответ панели по пользователю (со ссылками и прокси)"""
         endpoint = f"/api/user/{username}"
         try:
-            return self._make_request("GET", endpoint)
-        except Exception as e:
-            if "404" in str(e):
+            return await self._make_request("GET", endpoint)
+        except MarzbanAPIError as e:
+            if e.status == 404:
                 logger.warning(f"User {username} not found")
                 return None
             raise
 
-    def update_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_user(self, username: str, user_data: Dict[str, Any]) -> User:
         """Обновление данных пользователя"""
         endpoint = f"/api/user/{username}"
-        return self._make_request("PUT", endpoint, json=user_data)
+        result = User.from_dict(await self._make_request("PUT", endpoint, json=user_data))
+        self._notify_user_changed(username, result)
+        return result
 
-    def delete_user(self, username: str) -> bool:
+    async def delete_user(self, username: str) -> bool:
         """Удаление пользователя"""
         endpoint = f"/api/user/{username}"
         try:
-            self._make_request("DELETE", endpoint)
+            await self._make_request("DELETE", endpoint)
+            self._notify_user_changed(username, None)
             logger.info(f"User {username} deleted successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to delete user {username}: {str(e)}")
             return False
 
-    def get_users(self, status: Optional[str] = None, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    async def get_users(self, status: Optional[str] = None, offset: int = 0, limit: int = 100) -> List[User]:
         """Получение списка пользователей с пагинацией"""
         endpoint = "/api/users"
         params = {"offset": offset, "limit": limit}
         if status:
             params["status"] = status
         
-        response = self._make_request("GET", endpoint, params=params)
-        return response.get("users", [])
+        response = await self._make_request("GET", endpoint, params=params)
+        return [User.from_dict(user) for user in response.get("users", [])]
+
+    async def iter_users(
+        self,
+        status: Optional[str] = None,
+        page_size: int = 100,
+        prefetch: int = 3,
+        retries: int = 3,
+        backoff: float = 0.5
+    ) -> AsyncIterator[User]:
+        """Потоковый обход всех пользователей панели.
+
+        Следующие prefetch страниц запрашиваются параллельно, но новые
+        запросы ставятся только по мере потребления: в памяти не больше
+        prefetch страниц, сколько бы пользователей ни было в панели.
+        Временные ошибки страницы повторяются до retries раз, чтобы один
+        сбой не обрывал обход сотен страниц.
+        """
+        pending: Deque[asyncio.Task] = deque()
+        next_offset = 0
+
+        def schedule() -> None:
+            nonlocal next_offset
+            pending.append(asyncio.ensure_future(
+                self._get_page(status, next_offset, page_size, retries, backoff)
+            ))
+            next_offset += page_size
+
+        try:
+            for _ in range(max(1, prefetch)):
+                schedule()
+            
+            while pending:
+                page = await pending.popleft()
+                if len(page) < page_size:
+                    # Последняя страница: дальнейшие запросы не нужны
+                    for user in page:
+                        yield user
+                    break
+                schedule()
+                for user in page:
+                    yield user
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _get_page(
+        self,
+        status: Optional[str],
+        offset: int,
+        limit: int,
+        retries: int,
+        backoff: float
+    ) -> List[User]:
+        """Страница пользователей с повтором временных ошибок"""
+        for attempt in range(retries + 1):
+            try:
+                return await self.get_users(status=status, offset=offset, limit=limit)
+            except Exception as e:
+                if attempt >= retries or not is_transient(e):
+                    raise
+                logger.warning(f"Users page at offset {offset} failed, retrying: {str(e)}")
+                await asyncio.sleep(backoff * 2 ** attempt)
 
-    def get_system_stats(self) -> Dict[str, Any]:
+    async def get_system_stats(self) -> SystemStats:
         """Получение статистики системы"""
         endpoint = "/api/system"
-        return self._make_request("GET", endpoint)
+        return SystemStats.from_dict(await self._make_request("GET", endpoint))
 
-    def revoke_user_subscription(self, username: str) -> Dict[str, Any]:
+    async def revoke_user_subscription(self, username: str) -> User:
         """Отзыв подписки пользователя"""
         endpoint = f"/api/user/{username}/revoke_sub"
-        return self._make_request("POST", endpoint)
+        result = User.from_dict(await self._make_request("POST", endpoint))
+        self._notify_user_changed(username, result)
+        return result
 
-    def reset_user_traffic(self, username: str) -> Dict[str, Any]:
+    async def reset_user_traffic(self, username: str) -> User:
         """Сброс трафика пользователя"""
         endpoint = f"/api/user/{username}/reset_traffic"
-        return self._make_request("POST", endpoint)
+        result = User.from_dict(await self._make_request("POST", endpoint))
+        self._notify_user_changed(username, result)
+        return result
 
-    def get_user_usage(self, username: str) -> Dict[str, Any]:
+    async def get_user_usage(self, username: str) -> Dict[str, Any]:
         """Получение статистики использования пользователя"""
         endpoint = f"/api/user/{username}/usage"
-        return self._make_request("GET", endpoint)
+        return await self._make_request("GET", endpoint)
 
-    def get_all_nodes(self) -> List[Dict[str, Any]]:
+    async def get_all_nodes(self) -> List[Node]:
         """Получение списка всех узлов"""
         endpoint = "/api/nodes"
-        return self._make_request("GET", endpoint).get("nodes", [])
+        response = await self._make_request("GET", endpoint)
+        # Панель отдает список узлов без обертки
+        nodes = response if isinstance(response, list) else response.get("nodes", [])
+        return [Node.from_dict(node) for node in nodes]
 
-    def get_node(self, node_id: int) -> Dict[str, Any]:
+    async def get_node(self, node_id: int) -> Node:
         """Получение информации об узле"""
         endpoint = f"/api/node/{node_id}"
-        return self._make_request("GET", endpoint)
+        return Node.from_dict(await self._make_request("GET", endpoint))
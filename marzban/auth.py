@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+
+from marzban.metrics import client_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """Общий на процесс токен Marzban с отслеживанием срока действия.
+
+    Токен обновляется заранее (за refresh_margin секунд до истечения),
+    а параллельные вызовы ждут один общий запрос на /api/admin/token.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        refresh_margin: float = 60,
+        default_ttl: float = 3600
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _decode_exp(token: str) -> Optional[float]:
+        """Достаем поле exp из JWT (без проверки подписи)"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+            return float(exp) if exp else None
+        except (IndexError, ValueError, TypeError):
+            return None
+
+    def _is_fresh(self) -> bool:
+        return self._token is not None and time.time() < self._expires_at - self.refresh_margin
+
+    async def get_token(self, session: aiohttp.ClientSession, timeout: float) -> str:
+        """Актуальный токен; при необходимости выполняет единственный логин"""
+        if self._is_fresh():
+            return self._token
+
+        async with self._lock:
+            # Пока ждали блокировку, токен мог обновить другой вызов
+            if not self._is_fresh():
+                await self._refresh(session, timeout)
+            return self._token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Сбросить токен (например, после 401).
+
+        Если передан token, сбрасываем только его: так несколько запросов,
+        одновременно получивших 401, вызовут лишь одно переподключение.
+        """
+        if token is None or token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+
+    async def _refresh(self, session: aiohttp.ClientSession, timeout: float) -> None:
+        """Получение нового токена авторизации"""
+        endpoint = f"{self.base_url}/api/admin/token"
+        data = {
+            "grant_type": "password",
+            "username": self.username,
+            "password": self.password
+        }
+
+        template = "POST /api/admin/token"
+        started = time.perf_counter()
+        try:
+            logger.debug(f"Requesting token from {endpoint}")
+            async with session.post(
+                endpoint,
+                data=data,
+                auth=aiohttp.BasicAuth(self.username, self.password),
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                client_metrics.observe(template, time.perf_counter() - started, response.status)
+                response.raise_for_status()
+                payload = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not isinstance(e, aiohttp.ClientResponseError):
+                client_metrics.observe_exception(template, time.perf_counter() - started, e)
+            logger.error(f"Token request failed: {str(e)}")
+            raise ConnectionError(f"Could not connect to Marzban API: {str(e)}")
+
+        token = payload.get("access_token")
+        if not token:
+            raise ValueError("Empty access token received")
+
+        self._token = token
+        self._expires_at = self._decode_exp(token) or time.time() + self.default_ttl
+        logger.info("Successfully obtained access token")
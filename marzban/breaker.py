@@ -0,0 +1,136 @@
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Generic, Hashable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(ConnectionError):
+    """Панель считается недоступной: запрос не отправлялся"""
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к панели.
+
+    closed    - запросы идут, результаты копятся в скользящем окне;
+    open      - при доле ошибок или медленных ответов выше порога запросы
+                сразу отклоняются CircuitOpenError в течение cooldown;
+    half_open - после cooldown пропускается один пробный запрос: успех
+                закрывает предохранитель, ошибка снова открывает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        slow_call: float = 5.0,
+        slow_rate: float = 0.5,
+        window: float = 60.0,
+        min_calls: int = 10,
+        cooldown: float = 30.0
+    ):
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """Проверить, можно ли отправлять запрос.
+
+        Возвращает признак пробного запроса; его нужно передать в record()
+        или abandon() - состояние half-open решает только проба.
+        """
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            logger.info("Circuit half-open: probing Marzban panel")
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        raise CircuitOpenError("Marzban panel is unavailable (circuit open)")
+
+    def record(self, success: bool, latency: float, probe: bool = False) -> None:
+        """Учесть результат запроса, пропущенного before_call"""
+        now = time.monotonic()
+        slow = latency >= self.slow_call
+
+        if probe:
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open(now)
+            return
+        if self.state != self.CLOSED:
+            # Запрос начался до открытия: о текущем состоянии панели он не говорит
+            return
+
+        self._calls.append((now, success, slow))
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+        total = len(self._calls)
+        if total >= self.min_calls:
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+            if failures / total >= self.error_rate or slow_calls / total >= self.slow_rate:
+                self._open(now)
+
+    def abandon(self, probe: bool = False) -> None:
+        """Запрос прерван без итога (например, отменён).
+
+        Прерванная проба ничего не говорит о панели: предохранитель
+        возвращается в open без нового cooldown, и следующий запрос
+        станет новой пробой. Иначе флаг пробы остался бы взведённым и
+        все запросы отклонялись бы до перезапуска.
+        """
+        if probe:
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self._calls.clear()
+        logger.warning(f"Circuit opened: Marzban requests fail fast for {self.cooldown:.0f}s")
+
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self._calls.clear()
+        logger.info("Circuit closed: Marzban panel is back")
+
+
+class LastKnownGood(Generic[T]):
+    """Последние успешные ответы (LRU) для отдачи устаревших данных"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+
+    def put(self, key: Hashable, value: T) -> None:
+        self._items[key] = (time.time(), value)
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, T]]:
+        """(время получения, значение) или None"""
+        return self._items.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        self._items.pop(key, None)
@@ -0,0 +1,183 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+
+from config import Config
+from database import Database
+from marzban.api import MarzbanAPI, is_transient
+from utils import TokenBucket, call_with_retries, run_workers
+
+logger = logging.getLogger(__name__)
+
+Operation = Callable[[MarzbanAPI, str], Awaitable[Any]]
+ProgressCallback = Callable[["BulkResult"], Awaitable[None]]
+
+
+@dataclass
+class BulkResult:
+    """Итог массовой операции по пользователям"""
+    operation: str
+    total: int = 0
+    succeeded: int = 0
+    retries: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+    finished: bool = False
+    # Ошибка источника пользователей: операция прервана, счётчики частичные
+    error: Optional[str] = None
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+# ================== Операции ==================
+async def reset_traffic(api: MarzbanAPI, username: str) -> Any:
+    return await api.reset_user_traffic(username)
+
+
+async def revoke_subscription(api: MarzbanAPI, username: str) -> Any:
+    return await api.revoke_user_subscription(username)
+
+
+def update_fields(user_data: Dict[str, Any]) -> Operation:
+    """Одинаковое обновление полей для всех пользователей"""
+    async def operation(api: MarzbanAPI, username: str) -> Any:
+        return await api.update_user(username, user_data)
+    return operation
+
+
+def extend_expire(seconds: int) -> Operation:
+    """Продление срока (бессрочные пользователи не меняются)"""
+    async def operation(api: MarzbanAPI, username: str) -> Any:
+        user = await api.get_user(username)
+        if user is None:
+            raise LookupError("user not found")
+        if not user.expire:
+            return user
+        base = max(user.expire, int(time.time()))
+        return await api.update_user(username, {"expire": base + seconds})
+    return operation
+
+
+def add_data_limit(extra_bytes: int) -> Operation:
+    """Увеличение лимита трафика (безлимитные пользователи не меняются)"""
+    async def operation(api: MarzbanAPI, username: str) -> Any:
+        user = await api.get_user(username)
+        if user is None:
+            raise LookupError("user not found")
+        if not user.data_limit:
+            return user
+        return await api.update_user(username, {"data_limit": user.data_limit + extra_bytes})
+    return operation
+
+
+# ================== Выбор пользователей ==================
+async def select_usernames(
+    status: Optional[str] = None,
+    usernames: Optional[Iterable[str]] = None,
+    linked: bool = False
+) -> AsyncIterator[str]:
+    """Источник пользователей: список имен, привязанные в боте или фильтр по статусу.
+
+    Выборка по статусу сначала собирается целиком: операция сама меняет
+    статус (сброс трафика выводит из limited, продление - из expired), и
+    постраничный обход со смещением сдвигался бы и молча пропускал
+    пользователей.
+    """
+    if usernames is not None:
+        for username in usernames:
+            yield username
+    elif linked:
+        for username, _ in await Database().get_all_users():
+            yield username
+    else:
+        snapshot = [user.username async for user in MarzbanAPI().iter_users(status=status)]
+        for username in snapshot:
+            yield username
+
+
+# ================== Исполнитель ==================
+class BulkRunner:
+    """Выполнение операции над множеством пользователей.
+
+    Не больше concurrency запросов одновременно и не больше rate в секунду;
+    временные ошибки (сеть, 429, 5xx) повторяются с экспоненциальной паузой.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+        retries: int = 2,
+        backoff: float = 1.0
+    ):
+        self.concurrency = concurrency or Config.MARZBAN_BULK_CONCURRENCY
+        self.rate = rate or Config.MARZBAN_BULK_RATE
+        self.retries = retries
+        self.backoff = backoff
+
+    is_transient = staticmethod(is_transient)
+
+    async def run(
+        self,
+        name: str,
+        operation: Operation,
+        usernames: AsyncIterator[str],
+        on_progress: Optional[ProgressCallback] = None
+    ) -> BulkResult:
+        api = MarzbanAPI()
+        bucket = TokenBucket(self.rate, burst=self.concurrency)
+        result = BulkResult(name)
+
+        async def handle(username: str) -> None:
+            result.total += 1
+            await self._apply(api, operation, username, bucket, result)
+            if on_progress:
+                try:
+                    await on_progress(result)
+                except Exception as e:
+                    logger.warning(f"Bulk progress callback failed: {str(e)}")
+
+        try:
+            await run_workers(usernames, handle, self.concurrency)
+        except Exception as e:
+            # Источник упал: обработчики уже остановлены, отдаём частичный итог
+            result.error = str(e)[:200]
+            logger.error(f"Bulk {name} aborted: {result.error}")
+        finally:
+            result.finished = True
+            logger.info(
+                f"Bulk {name}: {result.succeeded}/{result.total} ok, "
+                f"{len(result.failed)} failed, {result.retries} retries in {result.elapsed:.1f}s"
+            )
+        return result
+
+    async def _apply(
+        self,
+        api: MarzbanAPI,
+        operation: Operation,
+        username: str,
+        bucket: TokenBucket,
+        result: BulkResult
+    ) -> None:
+        def on_retry(error: Exception, attempt: int) -> None:
+            result.retries += 1
+
+        try:
+            await call_with_retries(
+                lambda: operation(api, username),
+                self.is_transient,
+                self.retries,
+                self.backoff,
+                before_attempt=bucket.acquire,
+                on_retry=on_retry
+            )
+            result.succeeded += 1
+        except Exception as e:
+            result.failed[username] = str(e)[:200]
@@ -0,0 +1,242 @@
+"""Локальная замена панели Marzban для нагрузочных тестов.
+
+Запуск отдельно: python -m marzban.fake_server --users 10000 --latency 0.02
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+STATUSES = ("active", "active", "active", "expired", "limited", "disabled")
+
+
+def _make_token(ttl: int) -> str:
+    """JWT-подобный токен с полем exp (подпись не проверяется)"""
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    nonce = random.getrandbits(32)
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time()) + ttl, 'n': nonce})}.fake"
+
+
+def _make_user(username: str, rng: random.Random) -> Dict[str, Any]:
+    """Пользователь в формате ответа панели, с тяжелыми links/proxies"""
+    uid = "%032x" % rng.getrandbits(128)
+    return {
+        "username": username,
+        "status": rng.choice(STATUSES),
+        "used_traffic": rng.randint(0, 50 * 1024**3),
+        "lifetime_used_traffic": rng.randint(0, 500 * 1024**3),
+        "data_limit": rng.choice((None, 10 * 1024**3, 100 * 1024**3)),
+        "data_limit_reset_strategy": "no_reset",
+        "expire": rng.choice((None, int(time.time()) + rng.randint(-30, 365) * 86400)),
+        "note": "",
+        "sub_last_user_agent": rng.choice((None, "v2rayNG/1.8.5", "Streisand/1.5", "Hiddify/2.0")),
+        "online_at": None,
+        "proxies": {"vless": {"id": uid, "flow": ""}, "vmess": {"id": uid}},
+        "inbounds": {"vless": ["VLESS TCP REALITY"], "vmess": ["VMESS_INBOUND"]},
+        "links": [
+            f"vless://{uid}@example.com:443?security=reality&type=tcp&sni=example.com#{username}-{i}"
+            for i in range(4)
+        ],
+        "subscription_url": f"/sub/{uid}"
+    }
+
+
+class FakeMarzban:
+    """HTTP-сервер с API Marzban поверх словаря пользователей в памяти.
+
+    latency - базовая задержка ответа в секундах (плюс до 50% разброса),
+    error_rate - доля запросов, на которые отвечаем 500.
+    """
+
+    def __init__(
+        self,
+        users: int = 1000,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        token_ttl: int = 3600,
+        nodes: int = 3,
+        seed: int = 42
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+        self.users: Dict[str, Dict[str, Any]] = {}
+        for i in range(users):
+            username = f"user{i:06d}"
+            self.users[username] = _make_user(username, self.rng)
+        self.nodes = {
+            i: {"id": i, "name": f"node-{i}", "address": f"10.0.0.{i}", "port": 62050,
+                "status": "connected", "message": None, "xray_version": "1.8.4"}
+            for i in range(1, nodes + 1)
+        }
+        self.tokens = set()
+        self.requests = 0
+        self.logins = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    # ================== Служебное ==================
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.rng.random() * 0.5))
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return web.json_response({"detail": "Injected error"}, status=500)
+        if request.path != "/api/admin/token":
+            token = request.headers.get("Authorization", "")[len("Bearer "):]
+            if token not in self.tokens:
+                return web.json_response({"detail": "Could not validate credentials"}, status=401)
+        return await handler(request)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/api/admin/token", self.token)
+        app.router.add_post("/api/user", self.create_user)
+        app.router.add_get("/api/user/{username}", self.get_user)
+        app.router.add_put("/api/user/{username}", self.update_user)
+        app.router.add_delete("/api/user/{username}", self.delete_user)
+        app.router.add_post("/api/user/{username}/reset_traffic", self.reset_traffic)
+        app.router.add_post("/api/user/{username}/revoke_sub", self.revoke_sub)
+        app.router.add_get("/api/users", self.get_users)
+        app.router.add_get("/api/system", self.system)
+        app.router.add_get("/api/nodes", self.get_nodes)
+        app.router.add_get("/api/node/{node_id}", self.get_node)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить сервер; возвращает базовый URL"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeMarzban":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def _user_or_404(self, request: web.Request) -> Dict[str, Any]:
+        user = self.users.get(request.match_info["username"])
+        if user is None:
+            raise web.HTTPNotFound(
+                text=json.dumps({"detail": "User not found"}),
+                content_type="application/json"
+            )
+        return user
+
+    # ================== Эндпоинты ==================
+    async def token(self, request: web.Request) -> web.Response:
+        self.logins += 1
+        token = _make_token(self.token_ttl)
+        self.tokens.add(token)
+        return web.json_response({"access_token": token, "token_type": "bearer"})
+
+    async def create_user(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if data.get("username") in self.users:
+            return web.json_response({"detail": "User already exists"}, status=409)
+        user = _make_user(data["username"], self.rng)
+        user.update({k: v for k, v in data.items() if k in user and k not in ("proxies", "inbounds")})
+        self.users[user["username"]] = user
+        return web.json_response(user)
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return web.json_response(self._user_or_404(request))
+
+    async def update_user(self, request: web.Request) -> web.Response:
+        user = self._user_or_404(request)
+        data = await request.json()
+        user.update({k: v for k, v in data.items() if k in user})
+        return web.json_response(user)
+
+    async def delete_user(self, request: web.Request) -> web.Response:
+        self._user_or_404(request)
+        del self.users[request.match_info["username"]]
+        return web.json_response({})
+
+    async def reset_traffic(self, request: web.Request) -> web.Response:
+        user = self._user_or_404(request)
+        user["used_traffic"] = 0
+        # Как в Marzban: после сброса трафика лимит больше не исчерпан
+        if user["status"] == "limited":
+            user["status"] = "active"
+        return web.json_response(user)
+
+    async def revoke_sub(self, request: web.Request) -> web.Response:
+        user = self._user_or_404(request)
+        user["subscription_url"] = f"/sub/{self.rng.getrandbits(128):032x}"
+        return web.json_response(user)
+
+    async def get_users(self, request: web.Request) -> web.Response:
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", 100))
+        status = request.query.get("status")
+        users = [u for u in self.users.values() if not status or u["status"] == status]
+        return web.json_response({"users": users[offset:offset + limit], "total": len(users)})
+
+    async def system(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "version": "0.4.9-fake",
+            "mem_total": 4 * 1024**3,
+            "mem_used": int(self.rng.uniform(1, 3) * 1024**3),
+            "cpu_cores": 2,
+            "cpu_usage": round(self.rng.uniform(1, 90), 1),
+            "total_user": len(self.users),
+            "users_active": sum(1 for u in self.users.values() if u["status"] == "active"),
+            "online_users": self.rng.randint(0, 100),
+            "incoming_bandwidth": 0,
+            "outgoing_bandwidth": 0,
+            "incoming_bandwidth_speed": 0,
+            "outgoing_bandwidth_speed": 0
+        })
+
+    async def get_nodes(self, request: web.Request) -> web.Response:
+        return web.json_response(list(self.nodes.values()))
+
+    async def get_node(self, request: web.Request) -> web.Response:
+        node = self.nodes.get(int(request.match_info["node_id"]))
+        if node is None:
+            return web.json_response({"detail": "Node not found"}, status=404)
+        return web.json_response(node)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeMarzban(users=args.users, latency=args.latency, error_rate=args.errors, seed=args.seed)
+    url = await server.start(args.host, args.port)
+    print(f"Fake Marzban on {url} ({len(server.users)} users)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Marzban panel")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--errors", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
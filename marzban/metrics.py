@@ -0,0 +1,148 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Границы корзин гистограммы задержек, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ENDPOINT_TEMPLATES = (
+    (re.compile(r"^/api/user/[^/]+"), "/api/user/{username}"),
+    (re.compile(r"^/api/node/[^/]+"), "/api/node/{node_id}"),
+)
+
+
+def endpoint_template(method: str, endpoint: str) -> str:
+    """'/api/user/bob/usage' -> 'GET /api/user/{username}/usage'"""
+    for pattern, template in _ENDPOINT_TEMPLATES:
+        endpoint = pattern.sub(template, endpoint, count=1)
+    return f"{method} {endpoint}"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: запись - один bisect"""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля сверху: граница корзины, где он находится"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+
+class EndpointMetrics:
+    __slots__ = ("latency", "statuses", "exceptions", "retries")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: Counter = Counter()
+        self.exceptions: Counter = Counter()
+        self.retries = 0
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items() if status >= 400) + sum(self.exceptions.values())
+
+
+class ClientMetrics:
+    """Метрики HTTP-клиента Marzban по шаблонам эндпоинтов"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointMetrics] = {}
+
+    def get(self, template: str) -> EndpointMetrics:
+        metrics = self.endpoints.get(template)
+        if metrics is None:
+            metrics = self.endpoints[template] = EndpointMetrics()
+        return metrics
+
+    def observe(self, template: str, seconds: float, status: int) -> None:
+        metrics = self.get(template)
+        metrics.latency.observe(seconds)
+        metrics.statuses[status] += 1
+
+    def observe_exception(self, template: str, seconds: float, error: BaseException) -> None:
+        metrics = self.get(template)
+        metrics.latency.observe(seconds)
+        metrics.exceptions[type(error).__name__] += 1
+
+    def observe_retry(self, template: str) -> None:
+        self.get(template).retries += 1
+
+    def reset(self) -> None:
+        self.endpoints.clear()
+
+    def summary(self) -> List[Dict[str, object]]:
+        """Сводка по эндпоинтам, самые частые сверху"""
+        rows = []
+        for template, metrics in self.endpoints.items():
+            rows.append({
+                "endpoint": template,
+                "count": metrics.latency.count,
+                "avg": metrics.latency.total / metrics.latency.count if metrics.latency.count else 0.0,
+                "p50": metrics.latency.quantile(0.5),
+                "p95": metrics.latency.quantile(0.95),
+                "p99": metrics.latency.quantile(0.99),
+                "errors": metrics.errors,
+                "retries": metrics.retries,
+                "statuses": dict(metrics.statuses),
+                "exceptions": dict(metrics.exceptions)
+            })
+        return sorted(rows, key=lambda row: row["count"], reverse=True)
+
+    def export_prometheus(self, extra: Optional[Dict[str, int]] = None) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines = [
+            "# TYPE marzban_request_duration_seconds histogram",
+        ]
+        for template, metrics in sorted(self.endpoints.items()):
+            label = template.replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), metrics.latency.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'marzban_request_duration_seconds_bucket{{endpoint="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'marzban_request_duration_seconds_sum{{endpoint="{label}"}} {metrics.latency.total}')
+            lines.append(f'marzban_request_duration_seconds_count{{endpoint="{label}"}} {metrics.latency.count}')
+
+        lines.append("# TYPE marzban_responses_total counter")
+        for template, metrics in sorted(self.endpoints.items()):
+            label = template.replace('"', '\\"')
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f'marzban_responses_total{{endpoint="{label}",status="{status}"}} {count}')
+
+        lines.append("# TYPE marzban_exceptions_total counter")
+        for template, metrics in sorted(self.endpoints.items()):
+            label = template.replace('"', '\\"')
+            for name, count in sorted(metrics.exceptions.items()):
+                lines.append(f'marzban_exceptions_total{{endpoint="{label}",exception="{name}"}} {count}')
+
+        lines.append("# TYPE marzban_retries_total counter")
+        for template, metrics in sorted(self.endpoints.items()):
+            label = template.replace('"', '\\"')
+            lines.append(f'marzban_retries_total{{endpoint="{label}"}} {metrics.retries}')
+
+        for name, value in (extra or {}).items():
+            lines.append(f"# TYPE marzban_{name} gauge")
+            lines.append(f"marzban_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+client_metrics = ClientMetrics()
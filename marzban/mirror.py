@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, List, Set, Tuple
+
+from config import Config
+from marzban.api import MarzbanAPI
+from marzban.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class UsersMirror:
+    """Локальное зеркало списка пользователей Marzban.
+
+    Пользователи хранятся по username в порядке выдачи панели, поэтому
+    страница для админки - это срез списка за O(размер страницы).
+    Устаревшее зеркало отдается как есть и обновляется в фоне; изменения,
+    сделанные самим ботом через MarzbanAPI, применяются сразу.
+
+    Инкрементального обновления нет: API Marzban не умеет отдавать
+    пользователей, изменённых после момента времени, и фоновое обновление
+    перечитывает все страницы. Поэтому ttl по умолчанию большой (15 мин),
+    а точность между обновлениями держится на изменениях самого бота и
+    перечитывании помеченных (dirty) пользователей при показе.
+    """
+
+    def __init__(self, ttl: float = 900, page_size: int = 100, prefetch: int = 3):
+        self.ttl = ttl
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self._users: Dict[str, User] = {}
+        self._order: List[str] = []
+        self._dirty: Set[str] = set()
+        # Удалённые, но ещё не вычищенные из _order (чистка - одна на страницу)
+        self._removed: Set[str] = set()
+        # Изменения, сделанные ботом во время идущей перезагрузки
+        self._changed_during_load: Optional[Dict[str, Optional[User]]] = None
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        MarzbanAPI.add_user_listener(self._on_user_changed)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _compact(self) -> None:
+        """Убрать удалённых из порядка одним проходом, а не list.remove на каждого"""
+        if self._removed:
+            self._order = [name for name in self._order if name not in self._removed]
+            self._removed.clear()
+
+    async def _load(self) -> None:
+        """Полная перезагрузка зеркала потоковым обходом панели"""
+        users: Dict[str, User] = {}
+        order: List[str] = []
+        started = time.monotonic()
+        self._changed_during_load = {}
+        try:
+            async for user in MarzbanAPI().iter_users(page_size=self.page_size, prefetch=self.prefetch):
+                if user.username not in users:
+                    order.append(user.username)
+                users[user.username] = user
+        finally:
+            changed, self._changed_during_load = self._changed_during_load, None
+
+        # Подменяем целиком, чтобы читатели не видели половину данных
+        self._users, self._order = users, order
+        self._dirty.clear()
+        self._removed.clear()
+        # Страницы могли быть прочитаны до этих изменений: применяем их поверх
+        for username, data in changed.items():
+            self._on_user_changed(username, data)
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        logger.info(f"Users mirror loaded: {len(order)} users in {self._loaded_at - started:.2f}s")
+
+    def refresh_in_background(self) -> asyncio.Task:
+        """Запустить обновление, если оно еще не идет"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._load())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f"Users mirror refresh failed: {task.exception()}")
+
+    async def ensure_fresh(self) -> None:
+        """Первую загрузку ждем, дальше обновляем в фоне"""
+        if not self.is_loaded:
+            await asyncio.shield(self.refresh_in_background())
+        elif self.is_stale:
+            self.refresh_in_background()
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        """Пометить пользователя (или все зеркало) как устаревшие"""
+        if username is None:
+            self._loaded_at = float('-inf')
+        elif username in self._users:
+            self._dirty.add(username)
+
+    async def _refetch(self, username: str) -> None:
+        try:
+            self._on_user_changed(username, await MarzbanAPI().get_user(username))
+        except Exception as e:
+            logger.warning(f"Could not refresh mirrored user {username}: {str(e)}")
+
+    async def get_page(self, page: int, per_page: int) -> Tuple[List[User], int]:
+        """Страница пользователей и общее количество"""
+        await self.ensure_fresh()
+        self._compact()
+        names = self._order[page * per_page:(page + 1) * per_page]
+
+        dirty = [name for name in names if name in self._dirty]
+        if dirty:
+            await asyncio.gather(*(self._refetch(name) for name in dirty))
+            self._compact()
+            names = self._order[page * per_page:(page + 1) * per_page]
+
+        return [self._users[name] for name in names], len(self._order)
+
+    def _on_user_changed(self, username: str, data: Optional[User]) -> None:
+        """Применить изменение, сделанное через MarzbanAPI"""
+        if self._changed_during_load is not None:
+            self._changed_during_load[username] = data
+        self._dirty.discard(username)
+        if data is None:
+            if self._users.pop(username, None) is not None:
+                self._removed.add(username)
+        elif data.username == username:
+            if username not in self._users:
+                if username in self._removed:
+                    # Ещё стоит в _order: возвращаем на прежнее место
+                    self._removed.discard(username)
+                else:
+                    self._order.append(username)
+            self._users[username] = data
+        elif username in self._users:
+            # Ответ без данных пользователя: перечитаем при показе
+            self._dirty.add(username)
+
+
+users_mirror = UsersMirror(ttl=Config.MARZBAN_MIRROR_TTL)
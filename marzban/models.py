@@ -0,0 +1,103 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+# Быстрый JSON-декодер, если установлен orjson
+try:
+    import orjson
+    json_loads: Callable[[Any], Any] = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+if TYPE_CHECKING:
+    from marzban.api import MarzbanAPI
+
+
+@dataclass(frozen=True, slots=True)
+class User:
+    """Пользователь Marzban: только поля, которые использует бот.
+
+    Тяжелые поля ответа (links, proxies, inbounds) не хранятся, их можно
+    получить отдельным запросом через details().
+    """
+    username: str
+    status: str = "active"
+    used_traffic: int = 0
+    data_limit: Optional[int] = None
+    expire: Optional[int] = None
+    sub_last_user_agent: Optional[str] = None
+    online_at: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "User":
+        return cls(
+            username=data["username"],
+            status=data.get("status") or "active",
+            used_traffic=data.get("used_traffic") or 0,
+            data_limit=data.get("data_limit"),
+            expire=data.get("expire"),
+            sub_last_user_agent=data.get("sub_last_user_agent"),
+            online_at=data.get("online_at")
+        )
+
+    async def details(self, api: "MarzbanAPI") -> Optional[Dict[str, Any]]:
+        """Полный ответ панели (со ссылками и прокси) по запросу"""
+        return await api.get_user_details(self.username)
+
+
+@dataclass(frozen=True, slots=True)
+class SystemStats:
+    """Статистика сервера из /api/system"""
+    version: Optional[str] = None
+    cpu_usage: float = 0.0
+    cpu_cores: int = 0
+    mem_total: int = 0
+    mem_used: int = 0
+    total_user: int = 0
+    users_active: int = 0
+    online_users: int = 0
+    incoming_bandwidth: int = 0
+    outgoing_bandwidth: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SystemStats":
+        return cls(
+            version=data.get("version"),
+            cpu_usage=data.get("cpu_usage") or 0.0,
+            cpu_cores=data.get("cpu_cores") or 0,
+            mem_total=data.get("mem_total") or 0,
+            mem_used=data.get("mem_used") or 0,
+            total_user=data.get("total_user", data.get("total_users")) or 0,
+            users_active=data.get("users_active", data.get("active_users")) or 0,
+            online_users=data.get("online_users") or 0,
+            incoming_bandwidth=data.get("incoming_bandwidth") or 0,
+            outgoing_bandwidth=data.get("outgoing_bandwidth") or 0
+        )
+
+    @property
+    def mem_percent(self) -> float:
+        return self.mem_used / self.mem_total * 100 if self.mem_total else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class Node:
+    """Узел Marzban из /api/nodes"""
+    id: int
+    name: str
+    address: str = ""
+    port: Optional[int] = None
+    status: str = "unknown"
+    message: Optional[str] = None
+    xray_version: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Node":
+        return cls(
+            id=data["id"],
+            name=data.get("name") or str(data["id"]),
+            address=data.get("address") or "",
+            port=data.get("port"),
+            status=data.get("status") or "unknown",
+            message=data.get("message"),
+            xray_version=data.get("xray_version")
+        )
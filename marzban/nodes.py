@@ -0,0 +1,108 @@
+import asyncio
+import html
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+
+from config import Config
+from database import Database
+from marzban.api import MarzbanAPI
+from marzban.models import Node
+
+logger = logging.getLogger(__name__)
+
+NODE_ALERT = "⚠️ Узел <b>{}</b>: {} → {}"
+
+
+class NodeMonitor:
+    """Фоновый опрос узлов Marzban.
+
+    Хранит последний снимок /api/nodes и историю смен статуса, чтобы экран
+    узлов отрисовывался из памяти. При смене статуса узел перечитывается
+    через /api/node/{id}, и только подтвержденный переход рассылается админам.
+    """
+
+    def __init__(self, interval: float = 60, jitter: float = 0.1, history: int = 20):
+        self.interval = interval
+        self.jitter = jitter
+        self.nodes: Dict[int, Node] = {}
+        self.transitions: Deque[Tuple[float, str, str, str]] = deque(maxlen=history)
+        self.updated_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+
+    def start(self, bot: Optional[Bot] = None) -> None:
+        """Запустить опрос (bot нужен для уведомлений админов)"""
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Node poll failed: {str(e)}")
+            # Разброс интервала, чтобы опросы не шли строго в такт
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(delay)
+
+    async def poll(self) -> None:
+        """Один цикл опроса: обновить снимок и разослать изменения"""
+        api = MarzbanAPI(timeout=10)
+        fresh = {node.id: node for node in await api.get_all_nodes()}
+        changed: List[Tuple[str, str, str]] = []
+
+        for node_id, node in fresh.items():
+            previous = self.nodes.get(node_id)
+            if previous is None or previous.status == node.status:
+                continue
+            # Подтверждаем переход отдельным запросом по узлу
+            try:
+                node = fresh[node_id] = await api.get_node(node_id)
+            except Exception as e:
+                logger.warning(f"Node {node_id} detail failed: {str(e)}")
+            if previous.status != node.status:
+                changed.append((node.name, previous.status, node.status))
+
+        for node_id in self.nodes.keys() - fresh.keys():
+            changed.append((self.nodes[node_id].name, self.nodes[node_id].status, 'removed'))
+
+        self.nodes = fresh
+        self.updated_at = time.time()
+        self.last_error = None
+
+        for name, old, new in changed:
+            self.transitions.append((self.updated_at, name, old, new))
+            logger.info(f"Node {name}: {old} -> {new}")
+        if changed:
+            await self._alert(changed)
+
+    async def _alert(self, changed: List[Tuple[str, str, str]]) -> None:
+        if self._bot is None:
+            return
+        text = "\n".join(NODE_ALERT.format(html.escape(name), old, new) for name, old, new in changed)
+        admin_ids = set(await Database().get_admin_ids())
+        admin_ids.add(int(Config.ADMIN_ID))
+        for admin_id in admin_ids:
+            try:
+                await self._bot.send_message(admin_id, text, parse_mode="HTML")
+            except Exception as e:
+                logger.warning(f"Node alert to {admin_id} failed: {str(e)}")
+
+
+node_monitor = NodeMonitor(interval=Config.MARZBAN_NODES_INTERVAL)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from config import Config
+from database import Database
+from marzban.api import MarzbanAPI
+from marzban.models import SystemStats
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("cpu", "mem", "online", "active")
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """Кольцевой буфер фиксированного размера на array('d')"""
+
+    __slots__ = ("capacity", "_data", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = array('d', bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float) -> None:
+        index = (self._start + self._size) % self.capacity
+        self._data[index] = value
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def __getitem__(self, i: int) -> float:
+        """i-й элемент от старых к новым; отрицательные индексы - с конца"""
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("ring buffer index out of range")
+        return self._data[(self._start + i) % self.capacity]
+
+
+class StatsHistory:
+    """История /api/system: время замера и по буферу на каждую метрику"""
+
+    def __init__(self, capacity: int):
+        self.timestamps = RingBuffer(capacity)
+        self.series = {metric: RingBuffer(capacity) for metric in METRICS}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, ts: float, values: Dict[str, float]) -> None:
+        self.timestamps.append(ts)
+        for metric, buffer in self.series.items():
+            buffer.append(values.get(metric) or 0.0)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not len(self):
+            return None
+        return {"ts": self.timestamps[-1], **{m: b[-1] for m, b in self.series.items()}}
+
+    def window(self, seconds: float) -> Dict[str, List[float]]:
+        """Значения за последние seconds секунд (от старых к новым)"""
+        cutoff = time.time() - seconds
+        count = 0
+        # Идем с конца: стоимость пропорциональна окну, а не всей истории
+        while count < len(self) and self.timestamps[-count - 1] >= cutoff:
+            count += 1
+        start = len(self) - count
+        return {
+            metric: [buffer[i] for i in range(start, len(self))]
+            for metric, buffer in self.series.items()
+        }
+
+
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {"min": min(values), "avg": sum(values) / len(values), "max": max(values)}
+
+
+def sparkline(values: List[float], width: int = 24) -> str:
+    """Текстовый график: значения усредняются в width корзин"""
+    if not values:
+        return ""
+    if len(values) > width:
+        step = len(values) / width
+        values = [
+            sum(chunk) / len(chunk)
+            for chunk in (values[int(i * step):int((i + 1) * step)] for i in range(width))
+            if chunk
+        ]
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return "".join(SPARK_CHARS[int((v - low) / span * (len(SPARK_CHARS) - 1))] for v in values)
+
+
+def parse_system_stats(stats: SystemStats) -> Dict[str, float]:
+    """Приводим ответ /api/system к метрикам истории"""
+    return {
+        "cpu": float(stats.cpu_usage),
+        "mem": stats.mem_percent,
+        "online": float(stats.online_users),
+        "active": float(stats.users_active)
+    }
+
+
+class StatsSampler:
+    """Фоновый сбор /api/system с фиксированным интервалом.
+
+    Замеры хранятся в памяти в кольцевых буферах (объем не растет) и
+    сохраняются в таблицу system_stats, чтобы история пережила перезапуск.
+    """
+
+    def __init__(self, interval: float = 60, retention: float = 7 * 24 * 3600):
+        self.interval = interval
+        self.retention = retention
+        self.history = StatsHistory(int(retention // interval) + 1)
+        # Последний ответ панели; None, пока в этом процессе не было замера
+        self.last_stats: Optional[SystemStats] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def ensure_loaded(self) -> None:
+        """Восстановить историю один раз, до первого замера.
+
+        Замер, добавленный раньше восстановленных строк, нарушил бы порядок
+        времени, на который опирается StatsHistory.window().
+        """
+        async with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Stats history restore failed: {str(e)}")
+            self._loaded = True
+
+    async def load(self) -> None:
+        """Восстановить историю из SQLite"""
+        rows = await Database().get_system_samples(time.time() - self.retention)
+        for ts, cpu, mem, online, active in rows:
+            self.history.add(ts, {"cpu": cpu, "mem": mem, "online": online, "active": active})
+        logger.info(f"Stats history restored: {len(rows)} samples")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        await self.ensure_loaded()
+        samples = 0
+        while True:
+            started = time.monotonic()
+            try:
+                await self.sample()
+                samples += 1
+                # Чистим старые строки примерно раз в сутки
+                if samples % max(1, int(86400 // self.interval)) == 0:
+                    await Database().prune_system_samples(time.time() - self.retention)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stats sample failed: {str(e)}")
+            # Фиксированный шаг, независимо от длительности замера
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def sample(self) -> Dict[str, float]:
+        """Снять один замер, записать в буфер и в БД"""
+        self.last_stats = await MarzbanAPI(timeout=10).get_system_stats()
+        ts = time.time()
+        values = parse_system_stats(self.last_stats)
+        self.history.add(ts, values)
+        await Database().add_system_sample(
+            int(ts), values["cpu"], values["mem"], int(values["online"]), int(values["active"])
+        )
+        return values
+
+
+stats_sampler = StatsSampler(
+    interval=Config.MARZBAN_STATS_INTERVAL,
+    retention=Config.MARZBAN_STATS_RETENTION_DAYS * 24 * 3600
+)
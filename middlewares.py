@@ -0,0 +1,63 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from database import Database
+from user.texts import UserTexts
+
+
+class RoleMiddleware(BaseMiddleware):
+    """Определяет роль отправителя один раз на апдейт.
+
+    Роли берутся из кэша Database (без запроса к SQLite) и передаются
+    обработчикам как is_admin, is_moderator и role. Забаненные пользователи
+    отсекаются здесь, до фильтров, обработчиков и запросов к Marzban.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        is_admin, is_moderator, is_banned = await Database().get_roles(user.id)
+        if is_banned:
+            if isinstance(event, CallbackQuery):
+                await event.answer(UserTexts.BANNED, show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer(UserTexts.BANNED)
+            return None
+
+        data["is_admin"] = is_admin
+        data["is_moderator"] = is_moderator
+        data["role"] = "admin" if is_admin else "moder" if is_moderator else "user"
+        return await handler(event, data)
+
+
+class RoleFilter(Filter):
+    """Фильтр по роли, проставленной RoleMiddleware"""
+
+    def __init__(self, admin: bool = True, moderator: bool = False):
+        self.admin = admin
+        self.moderator = moderator
+
+    async def __call__(
+        self,
+        event: TelegramObject,
+        is_admin: bool = False,
+        is_moderator: bool = False
+    ) -> bool:
+        return (self.admin and is_admin) or (self.moderator and is_moderator)
+
+
+def setup_middlewares(dp) -> None:
+    """Подключить проверку ролей ко всем сообщениям и callback-запросам"""
+    middleware = RoleMiddleware()
+    dp.message.outer_middleware(middleware)
+    dp.callback_query.outer_middleware(middleware)
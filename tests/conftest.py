@@ -0,0 +1,24 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Конфиг читается при импорте: задаем окружение заранее (как в bench.py)
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("MARZBAN_URL", "http://127.0.0.1")
+os.environ.setdefault("MARZBAN_USERNAME", "test")
+os.environ.setdefault("MARZBAN_PASSWORD", "test")
+os.environ.setdefault("ADMIN_ID", "1")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def fresh_marzban_client(monkeypatch):
+    """Токен и предохранитель общие на процесс: у каждого теста своя панель"""
+    from marzban.api import MarzbanAPI
+    from marzban.breaker import CircuitBreaker
+
+    monkeypatch.setattr(MarzbanAPI, "_tokens", None)
+    monkeypatch.setattr(MarzbanAPI, "breaker", CircuitBreaker())
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from marzban.breaker import CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(cooldown: float = 0.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(min_calls=2, cooldown=cooldown)
+    for _ in range(2):
+        probe = breaker.before_call()
+        breaker.record(False, 0.01, probe)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_opens_on_error_rate_and_rejects():
+    breaker = open_breaker(cooldown=60)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_late_call_does_not_decide_half_open():
+    breaker = CircuitBreaker(min_calls=2, cooldown=0.0)
+    # Медленный запрос начался, пока предохранитель был закрыт
+    late = breaker.before_call()
+    for _ in range(2):
+        breaker.record(False, 0.01, breaker.before_call())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    probe = breaker.before_call()
+    assert probe and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True, 0.01, late)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Проба всё ещё в полёте: вторая не пропускается
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True, 0.01, probe)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_abandoned_probe_allows_next_probe():
+    breaker = open_breaker()
+    probe = breaker.before_call()
+    breaker.abandon(probe)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.before_call() is True
+
+
+def test_failed_probe_reopens():
+    breaker = open_breaker()
+    probe = breaker.before_call()
+    breaker.record(False, 0.01, probe)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at <= time.monotonic()
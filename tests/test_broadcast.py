@@ -0,0 +1,70 @@
+import asyncio
+import os
+import tempfile
+from collections import Counter
+
+from config import Config
+from database import Database
+from admin.broadcast import BroadcastWorker
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = Counter()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.05)
+        self.sent[chat_id] += 1
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+
+def test_recipients_failure_does_not_send_twice(monkeypatch):
+    users = 300
+    iter_recipients = Database.iter_recipients
+    failures = []
+
+    async def flaky_recipients(self, *args, **kwargs):
+        chunks = 0
+        async for chunk in iter_recipients(self, *args, **kwargs):
+            if not failures and chunks == 2:
+                failures.append(chunk[0])
+                raise ConnectionError("database is locked")
+            chunks += 1
+            yield chunk
+
+    monkeypatch.setattr(Database, "iter_recipients", flaky_recipients)
+    monkeypatch.setattr(Database, "_instance", None)
+    monkeypatch.setattr(Config, "BROADCAST_RATE", 10000)
+
+    async def main():
+        db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+        await db.connect()
+        for i in range(1, users + 1):
+            await db.execute(
+                "INSERT INTO users (marzban_username, telegram_id) VALUES (?, ?)",
+                (f"u{i}", i)
+            )
+        bot = FakeBot()
+        worker = BroadcastWorker(chunk=50, checkpoint_every=10, retry_delay=0.01)
+        worker.start(bot)
+        try:
+            job_id = await db.create_broadcast_job(1, "hello")
+            worker.notify()
+            for _ in range(200):
+                await asyncio.sleep(0.05)
+                job = await db.get_broadcast_job(job_id)
+                if job["status"] == "done":
+                    break
+        finally:
+            await worker.stop()
+            await db._cleanup()
+
+        assert failures, "recipients failure was not injected"
+        assert job["status"] == "done"
+        assert job["sent"] == users
+        assert set(bot.sent) == set(range(1, users + 1))
+        assert max(bot.sent.values()) == 1
+
+    asyncio.run(main())
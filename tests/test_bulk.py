@@ -0,0 +1,63 @@
+import asyncio
+
+from config import Config
+from marzban.api import MarzbanAPI
+from marzban.bulk import BulkRunner, reset_traffic, select_usernames
+from marzban.fake_server import FakeMarzban
+
+
+def run_with_panel(scenario, **server_args):
+    async def main():
+        server = FakeMarzban(**server_args)
+        Config.MARZBAN_URL = await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await MarzbanAPI.close()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def limited(server):
+    return [name for name, user in server.users.items() if user["status"] == "limited"]
+
+
+def test_status_selector_survives_operation_leaving_the_filter():
+    async def scenario(server):
+        before = limited(server)
+        assert len(before) > 100
+        # Сброс трафика выводит пользователей из limited во время обхода
+        result = await BulkRunner(rate=1000).run(
+            "reset", reset_traffic, select_usernames(status="limited")
+        )
+        assert result.error is None
+        assert result.succeeded == len(before)
+        assert limited(server) == []
+
+    run_with_panel(scenario, users=2000)
+
+
+def test_source_failure_returns_partial_result():
+    calls = []
+
+    async def source():
+        for i in range(20):
+            if i == 6:
+                raise ConnectionError("panel went away")
+            yield f"user{i:06d}"
+
+    async def operation(api, username):
+        calls.append(username)
+        await asyncio.sleep(0.01)
+
+    async def scenario(server):
+        result = await BulkRunner(concurrency=3, rate=1000).run("noop", operation, source())
+        handled = len(calls)
+        await asyncio.sleep(0.1)
+        assert len(calls) == handled
+        assert result.error == "panel went away"
+        assert result.done == handled
+        assert result.finished
+
+    run_with_panel(scenario, users=10)
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import tempfile
+
+from database import Database
+
+
+def with_database(scenario, monkeypatch):
+    monkeypatch.setattr(Database, "_instance", None)
+
+    async def main():
+        db = Database(os.path.join(tempfile.mkdtemp(), "test.db"))
+        await db.connect()
+        try:
+            await scenario(db)
+        finally:
+            await db._cleanup()
+
+    asyncio.run(main())
+
+
+def test_users_page_total_follows_counters(monkeypatch):
+    async def scenario(db):
+        for i in range(25):
+            await db.update_telegram_id(f"user{i:02d}", 1000 + i)
+        # Перепривязка (REPLACE) и отвязка не должны сбивать счётчик
+        await db.update_telegram_id("user00", 2000)
+        await db.execute("UPDATE users SET telegram_id = NULL WHERE marzban_username = ?", ("user01",))
+        await db.execute("DELETE FROM users WHERE marzban_username = ?", ("user02",))
+
+        page = await db.get_users_page(limit=10)
+        actual = (await db.fetchone("SELECT COUNT(*) FROM users WHERE telegram_id IS NOT NULL"))[0]
+        assert page["total"] == actual == 23
+        assert len(page["users"]) == 10 and page["has_next"]
+
+    with_database(scenario, monkeypatch)
+
+
+def test_linked_counter_seeded_on_upgrade(monkeypatch):
+    async def scenario(db):
+        for i in range(5):
+            await db.update_telegram_id(f"user{i}", 100 + i)
+        # База до v5: счётчика нет в триггерах, значение пересчитывается миграцией
+        await db.execute("UPDATE users_counters SET linked = 0 WHERE id = 1")
+        await db.conn.execute("PRAGMA user_version = 4")
+        await db._migrate()
+        await db._migrate()
+        assert (await db.get_users_page())["total"] == 5
+
+    with_database(scenario, monkeypatch)
@@ -0,0 +1,58 @@
+import asyncio
+
+from marzban.api import MarzbanAPI
+from marzban.fake_server import FakeMarzban
+from marzban.mirror import UsersMirror
+from marzban.models import User
+from config import Config
+
+
+def user(name: str, used: int = 0) -> User:
+    return User.from_dict({"username": name, "used_traffic": used})
+
+
+def loaded_mirror(names) -> UsersMirror:
+    mirror = UsersMirror(ttl=3600)
+    for name in names:
+        mirror._on_user_changed(name, user(name))
+    mirror._loaded = True
+    mirror.refresh_in_background = lambda: None
+    mirror._loaded_at = float("inf")
+    return mirror
+
+
+def test_deletes_keep_order_and_pages():
+    names = [f"u{i:03d}" for i in range(30)]
+    mirror = loaded_mirror(names)
+    for name in names[::2]:
+        mirror._on_user_changed(name, None)
+    # Удалённый и снова созданный возвращается на прежнее место
+    mirror._on_user_changed("u004", user("u004"))
+
+    page, total = asyncio.run(mirror.get_page(0, 5))
+    assert total == len(mirror) == 16
+    assert [u.username for u in page] == ["u001", "u003", "u004", "u005", "u007"]
+
+
+def test_changes_during_reload_survive_swap():
+    async def main():
+        server = FakeMarzban(users=1000, latency=0.02)
+        Config.MARZBAN_URL = await server.start()
+        try:
+            api = MarzbanAPI()
+            mirror = UsersMirror(page_size=100, prefetch=1)
+            names = list(server.users)
+            load = asyncio.create_task(mirror._load())
+            await asyncio.sleep(0.1)
+            # Первые страницы уже прочитаны: изменения идут мимо новых данных
+            await api.delete_user(names[0])
+            server.users[names[1]]["used_traffic"] = 5
+            await api.reset_user_traffic(names[1])
+            await load
+            assert names[0] not in mirror._users
+            assert mirror._users[names[1]].used_traffic == 0
+        finally:
+            await MarzbanAPI.close()
+            await server.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from utils import run_workers
+
+
+class Boom(Exception):
+    pass
+
+
+def test_processes_all_items():
+    handled = []
+
+    async def handle(item):
+        await asyncio.sleep(0.001)
+        handled.append(item)
+
+    asyncio.run(run_workers(range(50), handle, concurrency=5))
+    assert sorted(handled) == list(range(50))
+
+
+def test_source_failure_stops_all_workers():
+    started, finished = [], []
+    active = 0
+
+    async def items():
+        for i in range(100):
+            if i == 6:
+                raise Boom()
+            yield i
+
+    async def handle(item):
+        nonlocal active
+        active += 1
+        started.append(item)
+        await asyncio.sleep(0.05)
+        active -= 1
+        finished.append(item)
+
+    async def main():
+        with pytest.raises(Boom):
+            await run_workers(items(), handle, concurrency=3)
+        # Начатые обработчики доведены до конца, новые не запускаются
+        assert active == 0
+        assert sorted(started) == sorted(finished)
+        count = len(started)
+        await asyncio.sleep(0.2)
+        assert len(started) == count
+        assert not [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    asyncio.run(main())
+
+
+def test_cancel_cancels_workers():
+    async def handle(item):
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(run_workers(range(10), handle, concurrency=4))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    asyncio.run(main())
+
+
+def test_stopped_discards_queue():
+    handled = []
+
+    async def handle(item):
+        handled.append(item)
+        await asyncio.sleep(0.001)
+
+    asyncio.run(run_workers(range(100), handle, concurrency=2, stopped=lambda: len(handled) >= 10))
+    assert 10 <= len(handled) < 15
@@ -1,7 +1,7 @@
-import aiohttp
 from datetime import datetime
-from config import Config
-from utils import get_marzban_token, format_traffic
+from database import get_marzban_username
+from marzban.api import MarzbanAPI
+from utils import format_traffic
 from .texts import UserTexts
 
 class UserService:
@@ -20,22 +20,15 @@ class UserService:
             return None
 
         try:
-            token = await get_marzban_token()
-            headers = {"Authorization": f"Bearer {token}"}
+            data = await MarzbanAPI().get_user(marzban_username)
+            if not data:
+                return None
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{Config.MARZBAN_URL}/api/user/{marzban_username}",
-                    headers=headers
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    
-                    return {
-                        "username": marzban_username,
-                        "used": format_traffic(data.get("used_traffic", 0)),
-                        "total": format_traffic(data.get("data_limit", 0)),
-                        "expire": UserService._format_expiry_date(data.get("expire"))
-                    }
+            return {
+                "username": marzban_username,
+                "used": format_traffic(data.used_traffic),
+                "total": format_traffic(data.data_limit),
+                "expire": UserService._format_expiry_date(data.expire)
+            }
         except Exception as e:
             raise Exception(f"Ошибка получения данных: {str(e)}")
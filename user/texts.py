@@ -11,6 +11,9 @@ class UserTexts:
             f"└ Срок действия: {expire}"
         )
     
+    BANNED = "⛔ Доступ к боту для вас ограничен."
+    STALE_NOTE = "\n\n⚠️ Сервер временно недоступен, данные на {time}"
+    
     NO_SUBSCRIPTION = "У вас нет активной подписки."
     SUBSCRIPTION_ERROR = "Ошибка при получении данных. Попробуйте позже."
     APPS_MENU = "Выберите приложение для скачивания:"
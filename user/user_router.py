@@ -3,7 +3,6 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 from aiogram import Router
 from aiogram.fsm.state import State, StatesGroup
-import aiohttp
 import logging
 from datetime import datetime
 
@@ -16,7 +15,8 @@ from user.keyboards import (
     get_back_button
 )
 from user.texts import UserTexts
-from utils import get_marzban_token, format_traffic
+from marzban.api import MarzbanAPI, MarzbanAPIError, is_transient
+from utils import format_traffic
 
 # Инициализация роутера
 user_router = Router()
@@ -36,14 +36,22 @@ async def user_start(message: types.Message):
     await message.answer(UserTexts.START, reply_markup=get_user_main_menu())
 
 async def _get_user_data(marzban_username: str):
-    """Получение данных пользователя из Marzban"""
-    token = await get_marzban_token()
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            f"{Config.MARZBAN_URL}/api/user/{marzban_username}",
-            headers={"Authorization": f"Bearer {token}"}
-        ) as response:
-            return await response.json() if response.status == 200 else None
+    """Получение данных пользователя из Marzban.
+
+    Возвращает (данные, время получения). Если панель недоступна, отдаются
+    последние известные данные, и время показывает, насколько они устарели.
+    """
+    try:
+        return await MarzbanAPI(timeout=10).get_user(marzban_username), None
+    except Exception as e:
+        # Сбой панели (5xx/429 от прокси, сеть, CircuitOpenError), а не ответ 4xx
+        if is_transient(e):
+            if cached := MarzbanAPI.last_known_user(marzban_username):
+                fetched_at, user = cached
+                return user, fetched_at
+        if isinstance(e, MarzbanAPIError):
+            return None, None
+        raise
 
 @user_router.callback_query(F.data == "my_subscription")
 async def show_subscription(callback: types.CallbackQuery):
@@ -55,14 +63,18 @@ async def show_subscription(callback: types.CallbackQuery):
                 reply_markup=get_back_button()
             )
 
-        if user_data := await _get_user_data(marzban_username):
+        user_data, stale_since = await _get_user_data(marzban_username)
+        if user_data:
+            text = UserTexts.subscription_info(
+                username=marzban_username,
+                used=format_traffic(user_data.used_traffic),
+                total=format_traffic(user_data.data_limit),
+                expire=format_expiry_date(user_data.expire)
+            )
+            if stale_since:
+                text += UserTexts.STALE_NOTE.format(time=format_expiry_date(int(stale_since)))
             await callback.message.edit_text(
-                UserTexts.subscription_info(
-                    username=marzban_username,
-                    used=format_traffic(user_data.get("used_traffic", 0)),
-                    total=format_traffic(user_data.get("data_limit", 0)),
-                    expire=format_expiry_date(user_data.get("expire"))
-                ),
+                text,
                 reply_markup=get_subscription_actions(),
                 parse_mode="HTML"
             )
@@ -1,19 +1,19 @@
 # /root/production/utils.py
-import requests
+import asyncio
+import logging
+import time
 from config import Config
-from typing import Optional
+from marzban.api import MarzbanAPI
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 async def get_marzban_token() -> Optional[str]:
-    """Получение токена аутентификации Marzban"""
+    """Получение токена аутентификации Marzban (общий кэш процесса)"""
     try:
-        response = requests.post(
-            f"{Config.MARZBAN_URL}/api/admin/token",
-            data={
-                "username": Config.MARZBAN_USERNAME,
-                "password": Config.MARZBAN_PASSWORD
-            }
-        )
-        return response.json().get("access_token")
+        return await MarzbanAPI().get_token()
     except Exception as e:
         print(f"Ошибка получения токена: {e}")
         return None
@@ -28,3 +28,191 @@ def format_traffic(bytes_size: int) -> str:
             return f"{bytes_size:.2f} {unit}"
         bytes_size /= 1024
     return f"{bytes_size:.2f} TB"
+
+
+class TokenBucket:
+    """Ограничитель частоты: в среднем не более rate операций в секунду"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Дождаться разрешения на одну операцию (ожидающие идут по очереди)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def run_workers(
+    items: Union[Iterable[T], AsyncIterator[T]],
+    handle: Callable[[T], Awaitable[None]],
+    concurrency: int,
+    stopped: Optional[Callable[[], bool]] = None
+) -> None:
+    """Обработка items не более чем concurrency обработчиками одновременно.
+
+    Очередь ограничена 2 * concurrency элементами, поэтому источник
+    читается по мере обработки. Когда stopped() становится истинным, новые
+    элементы не берутся, а уже стоящие в очереди отбрасываются. Ошибка
+    handle только логируется: итог элемента учитывает сам handle.
+
+    Если падает сам источник, очередь отбрасывается, начатые handle
+    доводятся до конца, и только затем ошибка пробрасывается; при отмене
+    обработчики отменяются. Ни один обработчик не переживает вызов.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    done = object()
+    aborted = False
+
+    def is_stopped() -> bool:
+        return aborted or (stopped is not None and stopped())
+
+    async def produce() -> None:
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                if is_stopped():
+                    break
+                await queue.put(item)
+        else:
+            for item in items:
+                if is_stopped():
+                    break
+                await queue.put(item)
+
+    async def worker() -> None:
+        while (item := await queue.get()) is not done:
+            if is_stopped():
+                continue
+            try:
+                await handle(item)
+            except Exception as e:
+                logger.error(f"Worker failed on {item!r}: {str(e)}")
+
+    async def finish() -> None:
+        for _ in workers:
+            await queue.put(done)
+        await asyncio.gather(*workers)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        try:
+            await produce()
+        except Exception:
+            aborted = True
+            await finish()
+            raise
+        await finish()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[T]],
+    is_transient: Callable[[Exception], bool],
+    retries: int,
+    backoff: float,
+    before_attempt: Optional[Callable[[], Awaitable[None]]] = None,
+    on_retry: Optional[Callable[[Exception, int], Optional[float]]] = None
+) -> T:
+    """Вызов с повтором временных ошибок и экспоненциальной паузой.
+
+    before_attempt ждёт перед каждой попыткой (например, лимит частоты).
+    on_retry(ошибка, номер попытки) вызывается перед повтором и может
+    вернуть свою паузу вместо backoff * 2 ** attempt. Постоянная ошибка
+    или последняя временная пробрасываются.
+    """
+    for attempt in range(retries + 1):
+        if before_attempt is not None:
+            await before_attempt()
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            delay = on_retry(e, attempt) if on_retry is not None else None
+            await asyncio.sleep(backoff * 2 ** attempt if delay is None else delay)
+
+
+def format_duration(seconds: float) -> str:
+    """Длительность в виде 1ч 05м / 3м 20с / 15с"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}ч {seconds % 3600 // 60:02d}м"
+    if seconds >= 60:
+        return f"{seconds // 60}м {seconds % 60:02d}с"
+    return f"{seconds}с"
+
+
+class ProgressReporter:
+    """Живой прогресс длительной операции в статусном сообщении.
+
+    Сообщение правится не чаще раза в interval секунд и только если текст
+    изменился, так что частые вызовы update() не упираются в лимиты
+    Telegram на редактирование. Скорость считается от запуска репортера,
+    без учёта initial - сделанного до него (например, до перезапуска).
+    """
+
+    def __init__(
+        self,
+        edit: Callable[[str], Awaitable[Any]],
+        title: str,
+        total: Optional[int] = None,
+        initial: int = 0,
+        interval: Optional[float] = None
+    ):
+        self.edit = edit
+        self.title = title
+        self.total = total
+        self.initial = initial
+        self.interval = interval or Config.PROGRESS_INTERVAL
+        self.started_at = time.monotonic()
+        self._next_edit = self.started_at + self.interval
+        self._last_text: Optional[str] = None
+
+    def render(self, done: int, failed: int = 0) -> str:
+        elapsed = time.monotonic() - self.started_at
+        rate = (done - self.initial) / elapsed if elapsed > 0 else 0.0
+        lines = [f"⏳ {self.title}"]
+        if self.total is not None:
+            remaining = max(self.total - done, 0)
+            lines.append(f"┌ Обработано: {done}/{self.total}")
+            lines.append(f"├ Успешно: {done - failed}, ошибок: {failed}")
+            lines.append(f"├ Осталось: {remaining}")
+            eta = format_duration(remaining / rate) if rate > 0 else "—"
+            lines.append(f"└ Скорость: {rate:.1f}/с, ещё ~{eta}")
+        else:
+            lines.append(f"┌ Обработано: {done}")
+            lines.append(f"├ Успешно: {done - failed}, ошибок: {failed}")
+            lines.append(f"└ Скорость: {rate:.1f}/с")
+        return "\n".join(lines)
+
+    async def update(self, done: int, failed: int = 0) -> None:
+        """Обновить сообщение, если прошло interval секунд с прошлой правки"""
+        now = time.monotonic()
+        if now < self._next_edit:
+            return
+        # Слот занимается до await, чтобы параллельные вызовы не правили дважды
+        self._next_edit = now + self.interval
+        text = self.render(done, failed)
+        if text == self._last_text:
+            return
+        try:
+            await self.edit(text)
+            self._last_text = text
+        except Exception as e:
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after:
+                self._next_edit = time.monotonic() + retry_after
+            logger.warning(f"Progress update failed: {str(e)}")